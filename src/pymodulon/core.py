@@ -4,10 +4,12 @@ Core functions for the IcaData object
 
 import copy
 import logging
+import os
 import re
 
 import numpy as np
 import pandas as pd
+from joblib import Memory
 from matplotlib import pyplot as plt
 from sklearn.cluster import KMeans
 from tqdm import tqdm_notebook as tqdm
@@ -18,7 +20,12 @@ from pymodulon.enrichment import (
     compute_trn_enrichment,
     contingency,
 )
-from pymodulon.util import _check_dict, _check_table, compute_threshold
+from pymodulon.util import (
+    _check_dict,
+    _check_table,
+    _compute_threshold_sweep,
+    compute_all_thresholds,
+)
 
 
 class IcaData(object):
@@ -279,12 +286,11 @@ class IcaData(object):
     @property
     def M_binarized(self):
         """Get binarized version of M matrix based on current thresholds"""
-        m_binarized = pd.DataFrame().reindex_like(self.M)
-        m_binarized[:] = 0
-        for imodulon in m_binarized.columns:
-            in_imodulon = abs(self.M[imodulon]) > self.thresholds[imodulon]
-            m_binarized.loc[in_imodulon, imodulon] = 1
-        return m_binarized
+        thresholds = np.array([self.thresholds[k] for k in self.M.columns])
+        in_imodulon = np.abs(self.M.values) > thresholds
+        return pd.DataFrame(
+            in_imodulon.astype(float), index=self.M.index, columns=self.M.columns
+        )
 
     @property
     def A(self):
@@ -934,10 +940,7 @@ class IcaData(object):
         self._cutoff_optimized = False
 
     def _update_thresholds(self, dagostino_cutoff: int):
-        self._thresholds = {
-            k: compute_threshold(self._m[k], dagostino_cutoff)
-            for k in self._imodulon_names
-        }
+        self._thresholds = compute_all_thresholds(self._m, dagostino_cutoff)
         self._dagostino_cutoff = dagostino_cutoff
 
     def reoptimize_thresholds(self, progress=True, plot=True):
@@ -994,69 +997,14 @@ class IcaData(object):
             New D'agostino cutoff
         """
 
-        # prepare a DataFrame of the best single-TF enrichments for the
-        # top 20 genes in each component
-        top_enrichments = []
-        all_genes = list(self.M.index)
-        for imod in self.M.columns:
-
-            genes_top20 = list(abs(self.M[imod]).sort_values().iloc[-20:].index)
-            imod_enrichment_df = compute_trn_enrichment(
-                set(genes_top20), set(all_genes), self.trn, max_regs=1
-            )
-
-            # compute_trn_enrichment is being hijacked a bit; we want
-            # the index to be components, not the enriched TFs
-            imod_enrichment_df["TF"] = imod_enrichment_df.index
-            imod_enrichment_df["component"] = imod
-
-            if not imod_enrichment_df.empty:
-                # take the best single-TF enrichment row (by q-value)
-                top_enrichment = imod_enrichment_df.sort_values(by="qvalue").iloc[0, :]
-                top_enrichments.append(top_enrichment)
-
         # perform a sensitivity analysis to determine threshold effects
-        # on precision/recall overall
+        # on precision/recall overall. This only depends on M and the TRN,
+        # so it is cached on disk if PYMODULON_CACHE is set
         cutoffs_to_try = np.arange(50, 2000, 50)
-        f1_scores = []
-
-        if progress:
-            iterator = tqdm(cutoffs_to_try)
-        else:
-            iterator = cutoffs_to_try
-
-        for cutoff in iterator:
-            cutoff_f1_scores = []
-            for enrich_row in top_enrichments:
-                # for this enrichment row, get all the genes regulated
-                # by the regulator chosen above
-                regulon_genes = list(
-                    self.trn[self.trn["regulator"] == enrich_row["TF"]].gene_id
-                )
-
-                # compute the weighting threshold based on this cutoff to try
-                thresh = compute_threshold(self.M[enrich_row["component"]], cutoff)
-                component_genes = self.M[
-                    abs(self.M[enrich_row["component"]]) > thresh
-                ].index.tolist()
-
-                # Compute the contingency table (aka confusion matrix)
-                # for overlap between the regulon and iM genes
-                ((tp, fp), (fn, tn)) = contingency(
-                    set(regulon_genes), component_genes, set(all_genes)
-                )
-
-                # Calculate F1 score for one regulator-component pair
-                # and add it to the running list for this cutoff
-                precision = np.true_divide(tp, tp + fp) if tp > 0 else 0
-                recall = np.true_divide(tp, tp + fn) if tp > 0 else 0
-                f1_score = (
-                    (2 * precision * recall) / (precision + recall) if tp > 0 else 0
-                )
-                cutoff_f1_scores.append(f1_score)
-
-            # Get mean of F1 score for this potential cutoff
-            f1_scores.append(np.mean(cutoff_f1_scores))
+        memory = Memory(location=os.environ.get("PYMODULON_CACHE"), verbose=0)
+        f1_scores = memory.cache(_cutoff_f1_scores, ignore=["progress"])(
+            self.M, self.trn, cutoffs_to_try, progress
+        )
 
         # extract the best cutoff
         best_cutoff = cutoffs_to_try[np.argmax(f1_scores)]
@@ -1326,3 +1274,95 @@ class MotifInfo:
     @matches.setter
     def matches(self, matches):
         self._matches = matches
+
+
+def _cutoff_f1_scores(M, trn, cutoffs_to_try, progress):
+    """
+    Computes the mean F1 score between each component and its best single-TF
+    enrichment (among its 20 highest-weighted genes) for each D'agostino
+    cutoff
+
+    Parameters
+    ----------
+    M : ~pandas.DataFrame
+        M matrix from ICA
+    trn : ~pandas.DataFrame
+        Transcriptional regulatory network
+    cutoffs_to_try : ~numpy.ndarray
+        D'agostino cutoffs to compute F1 scores for
+    progress : bool
+        Show a progress bar
+
+    Returns
+    -------
+    list
+        Mean F1 score for each cutoff
+    """
+
+    # prepare a DataFrame of the best single-TF enrichments for the
+    # top 20 genes in each component
+    top_enrichments = []
+    all_genes = list(M.index)
+    for imod in M.columns:
+
+        genes_top20 = list(abs(M[imod]).sort_values().iloc[-20:].index)
+        imod_enrichment_df = compute_trn_enrichment(
+            set(genes_top20), set(all_genes), trn, max_regs=1
+        )
+
+        # compute_trn_enrichment is being hijacked a bit; we want
+        # the index to be components, not the enriched TFs
+        imod_enrichment_df["TF"] = imod_enrichment_df.index
+        imod_enrichment_df["component"] = imod
+
+        if not imod_enrichment_df.empty:
+            # take the best single-TF enrichment row (by q-value)
+            top_enrichment = imod_enrichment_df.sort_values(by="qvalue").iloc[0, :]
+            top_enrichments.append(top_enrichment)
+
+    # perform a sensitivity analysis to determine threshold effects
+    # on precision/recall overall
+    f1_scores = []
+
+    if progress:
+        iterator = tqdm(cutoffs_to_try)
+    else:
+        iterator = cutoffs_to_try
+
+    # for each enrichment row, get all the genes regulated by the
+    # regulator chosen above, and the component weights; these do not
+    # depend on the cutoff, so only look them up once
+    enrich_inputs = []
+    for enrich_row in top_enrichments:
+        regulon_genes = set(trn[trn["regulator"] == enrich_row["TF"]].gene_id)
+        component = M[enrich_row["component"]]
+
+        # compute the weighting thresholds for all cutoffs to try at once
+        thresholds = _compute_threshold_sweep(component, cutoffs_to_try)
+        enrich_inputs.append(
+            (regulon_genes, component, np.abs(component.values), thresholds)
+        )
+    all_genes = set(all_genes)
+
+    for i, _ in enumerate(iterator):
+        cutoff_f1_scores = []
+        for regulon_genes, component, abs_weights, thresholds in enrich_inputs:
+            component_genes = component.index[abs_weights > thresholds[i]]
+
+            # Compute the contingency table (aka confusion matrix)
+            # for overlap between the regulon and iM genes
+            ((tp, fp), (fn, tn)) = contingency(
+                regulon_genes, component_genes, all_genes
+            )
+
+            # Calculate F1 score for one regulator-component pair
+            # and add it to the running list for this cutoff
+            precision = np.true_divide(tp, tp + fp) if tp > 0 else 0
+            recall = np.true_divide(tp, tp + fn) if tp > 0 else 0
+            f1_score = (2 * precision * recall) / (precision + recall) if tp > 0 else 0
+            cutoff_f1_scores.append(f1_score)
+
+        # Get mean of F1 score for this potential cutoff
+        f1_scores.append(np.mean(cutoff_f1_scores))
+
+    return f1_scores
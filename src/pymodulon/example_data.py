@@ -4,6 +4,7 @@ Pre-loaded example dataset for PyModulon tutorials.
 
 from os import path
 
+import numpy as np
 import pandas as pd
 
 from pymodulon.io import load_json_model
@@ -13,14 +14,28 @@ _data_dir = path.join(path.abspath(path.dirname(__file__)), "data")
 
 _ecoli_dir = path.join(_data_dir, "ecoli")
 
+
+def _read_matrix(filename):
+    """
+    Read a gene/sample matrix of float64 values, skipping dtype inference
+    """
+    columns = pd.read_csv(filename, index_col=0, nrows=0).columns
+    dtype = {col: np.float64 for col in columns}
+    return pd.read_csv(filename, index_col=0, dtype=dtype, engine="c", memory_map=True)
+
+
+def _read_table(filename, index_col=0):
+    return pd.read_csv(filename, index_col=index_col, engine="c", memory_map=True)
+
+
 # E. coli datasets
-M = pd.read_csv(path.join(_ecoli_dir, "M.csv"), index_col=0)
-A = pd.read_csv(path.join(_ecoli_dir, "A.csv"), index_col=0)
-X = pd.read_csv(path.join(_ecoli_dir, "X.csv"), index_col=0)
-gene_table = pd.read_csv(path.join(_ecoli_dir, "gene_table.csv"), index_col=0)
-sample_table = pd.read_csv(path.join(_ecoli_dir, "sample_table.csv"), index_col=0)
-imodulon_table = pd.read_csv(path.join(_ecoli_dir, "imodulon_table.csv"), index_col=0)
-trn = pd.read_csv(path.join(_ecoli_dir, "trn.csv"), index_col=None)
+M = _read_matrix(path.join(_ecoli_dir, "M.csv"))
+A = _read_matrix(path.join(_ecoli_dir, "A.csv"))
+X = _read_matrix(path.join(_ecoli_dir, "X.csv"))
+gene_table = _read_table(path.join(_ecoli_dir, "gene_table.csv"))
+sample_table = _read_table(path.join(_ecoli_dir, "sample_table.csv"))
+imodulon_table = _read_table(path.join(_ecoli_dir, "imodulon_table.csv"))
+trn = _read_table(path.join(_ecoli_dir, "trn.csv"), index_col=None)
 
 # E. coli genome annotations
 ecoli_fasta = path.join(_ecoli_dir, "genome.fasta")
@@ -2,11 +2,13 @@
 Functions for writing a directory for iModulonDB webpages
 """
 
+import csv
 import logging
 import os
 import re
 from itertools import chain
-from zipfile import ZipFile
+from multiprocessing import get_context
+from zipfile import ZIP_DEFLATED, ZipFile
 
 import numpy as np
 import pandas as pd
@@ -16,6 +18,25 @@ from tqdm.notebook import tqdm
 from pymodulon.plotting import _broken_line, _get_fit, _solid_line
 
 
+# Separates the TFs in a regulator string, e.g. "Crp+Fnr/ArcA"
+_TF_SPLIT = re.compile("[+/]")
+
+# hard-coded TF names for get_tfs_to_scatter
+# should just modify TRN/gene info so everything matches but ok
+_RENAME_TFS = {
+    "csqR": "yihW",
+    "hprR": "yedW",
+    "thi-box": "Thi-box",
+    "FlhDC": "flhD",
+    "RcsAB": "rcsB",
+    "ntrC": "glnG",
+    "gutR": "srlR",
+    "IHF": "ihfB",
+    "H-NS": "hns",
+    "GadE-RcsB": "gadE",
+}
+
+
 ##################
 # User Functions #
 ##################
@@ -69,18 +90,17 @@ def imodulondb_compatibility(model, inplace=False, tfcomplex_to_gene=None):
     if tfcomplex_to_gene is None:
         tfcomplex_to_gene = {}
 
-    table_issues = pd.DataFrame(columns=["Table", "Missing Column", "Solution"])
+    issues_rows = []
 
     # Check for X
     if model.X is None:
-        table_issues = table_issues.append(
+        issues_rows.append(
             {
                 "Table": "X",
                 "Missing Column": "all",
                 "Solution": "CRITICAL. Add the expression matrix"
                 " so that gene pages can be generated.",
-            },
-            ignore_index=True,
+            }
         )
         logging.warning("Critical issue: No X matrix")
 
@@ -101,13 +121,12 @@ def imodulondb_compatibility(model, inplace=False, tfcomplex_to_gene=None):
                 solution = "The publication name will not be a hyperlink."
             else:
                 solution = 'The default, "{}", will be used.'.format(v)
-            table_issues = table_issues.append(
+            issues_rows.append(
                 {
                     "Table": "iModulonDB",
                     "Missing Column": k,
                     "Solution": solution,
-                },
-                ignore_index=True,
+                }
             )
 
     # Check the gene table
@@ -127,13 +146,12 @@ def imodulondb_compatibility(model, inplace=False, tfcomplex_to_gene=None):
     for col in gene_table_cols.keys():
         if not (col in gene_table_lower.keys()):
 
-            table_issues = table_issues.append(
+            issues_rows.append(
                 {
                     "Table": "Gene",
                     "Missing Column": col,
                     "Solution": gene_table_cols[col],
-                },
-                ignore_index=True,
+                }
             )
 
             if (col in ["gene_name", "gene_product"]) & inplace:
@@ -144,14 +162,12 @@ def imodulondb_compatibility(model, inplace=False, tfcomplex_to_gene=None):
             )
 
     # check for missing gene links
-    missing_g_links = []
-    for g in model.M.index:
-        if (
-            not (isinstance(model.gene_links[g], str))
-            or model.gene_links[g].strip() == ""
-        ):
-            missing_g_links.append(g)
-    missing_g_links = pd.Series(missing_g_links, name="missing_gene_links")
+    gene_links = pd.Series(model.gene_links, dtype=object).reindex(model.M.index)
+    is_str = gene_links.map(lambda link: isinstance(link, str)).astype(bool)
+    no_link = gene_links.where(is_str, "").astype(str).str.strip() == ""
+    missing_g_links = pd.Series(
+        model.M.index[no_link.values], name="missing_gene_links"
+    )
 
     # check for errors in the n_replicates column of the sample table
     if inplace & ("n_replicates" in model.sample_table.columns):
@@ -181,21 +197,21 @@ def imodulondb_compatibility(model, inplace=False, tfcomplex_to_gene=None):
         "doi": "Clicking on activity plot bars will not link to relevant"
         " papers for the samples.",
     }
-    sample_table_lower = {i.lower(): i for i in model.sample_table.columns}
+    sample_cols_lower = [i.lower() for i in model.sample_table.columns]
+    sample_table_lower = dict(zip(sample_cols_lower, model.sample_table.columns))
 
-    if model.sample_table.columns.str.lower().duplicated().any():
+    if len(sample_table_lower) < len(sample_cols_lower):
         logging.warning(
             "Critical issue: Duplicated column names"
             " (case insensitive) in sample_table"
         )
-        table_issues = table_issues.append(
+        issues_rows.append(
             {
                 "Table": "Sample",
                 "Missing Column": "N/A - Duplicated Columns Exist",
                 "Solution": "Column names (case insensitive) should not "
                 "be duplicated. Pay special attention the 'sample' column.",
-            },
-            ignore_index=True,
+            }
         )
 
     for col in sample_table_cols.keys():
@@ -208,13 +224,12 @@ def imodulondb_compatibility(model, inplace=False, tfcomplex_to_gene=None):
                     "Critical issue: No {} column in sample_table.".format(col)
                 )
 
-            table_issues = table_issues.append(
+            issues_rows.append(
                 {
                     "Table": "Sample",
                     "Missing Column": col,
                     "Solution": sample_table_cols[col],
-                },
-                ignore_index=True,
+                }
             )
 
             if (col == "n_replicates") & inplace:
@@ -260,13 +275,12 @@ def imodulondb_compatibility(model, inplace=False, tfcomplex_to_gene=None):
 
     for col in iM_table_cols.keys():
         if not (col in iM_table_lower.keys()):
-            table_issues = table_issues.append(
+            issues_rows.append(
                 {
                     "Table": "iModulon",
                     "Missing Column": col,
                     "Solution": iM_table_cols[col],
-                },
-                ignore_index=True,
+                }
             )
             if inplace:
                 if col == "name":
@@ -277,8 +291,9 @@ def imodulondb_compatibility(model, inplace=False, tfcomplex_to_gene=None):
                     else:
                         model.imodulon_table["name"] = model.imodulon_table.index
                 elif col == "n_genes":
-                    model.imodulon_table["n_genes"] = model.M_binarized.sum().astype(
-                        int
+                    m_bin = model.M_binarized
+                    model.imodulon_table["n_genes"] = pd.Series(
+                        m_bin.values.sum(axis=0, dtype=int), index=m_bin.columns
                     )
                 else:
                     model.imodulon_table[col] = np.nan
@@ -291,31 +306,39 @@ def imodulondb_compatibility(model, inplace=False, tfcomplex_to_gene=None):
             model.rename_imodulons(
                 dict(zip(model.imodulon_names, range(len(model.imodulon_names))))
             )
-        for idx, tf in zip(model.imodulon_table.index, model.imodulon_table.regulator):
-            try:
-                model.imodulon_table.loc[idx, "regulator_readable"] = (
-                    model.imodulon_table.regulator[idx]
-                    .replace("/", " or ")
-                    .replace("+", " and ")
-                )
-            except AttributeError:
-                model.imodulon_table.loc[
-                    idx, "regulator_readable"
-                ] = model.imodulon_table.regulator[idx]
+        reg = model.imodulon_table.regulator
+        readable = (
+            reg.astype("string")
+            .str.replace("/", " or ", regex=False)
+            .str.replace("+", " and ", regex=False)
+        )
+        model.imodulon_table["regulator_readable"] = readable.astype(object).where(
+            reg.notna(), reg
+        )
+
+    table_issues = pd.DataFrame(
+        issues_rows, columns=["Table", "Missing Column", "Solution"]
+    )
 
     # check the TRN
     cols = ["in_trn", "has_link", "has_gene"]
-    tf_issues = pd.DataFrame(columns=cols)
+    tf_rows = {}
 
     if "regulator" in iM_table_lower.keys():
         if inplace:
             reg_idx = "regulator"
         else:
             reg_idx = iM_table_lower["regulator"]
+        # parse each distinct regulator string only once
+        trn_regs = set(model.trn.regulator)
+        tf_string_issues = {}
         for tf_string in model.imodulon_table[reg_idx]:
-            _, no_trn = parse_tf_string(model, tf_string)
-            _, no_link = tf_with_links(model, tf_string)
-            _, no_gene = get_tfs_to_scatter(model, tf_string, tfcomplex_to_gene)
+            if tf_string not in tf_string_issues:
+                _, no_trn = parse_tf_string(model, tf_string, trn_regs=trn_regs)
+                _, no_link = tf_with_links(model, tf_string)
+                _, no_gene = get_tfs_to_scatter(model, tf_string, tfcomplex_to_gene)
+                tf_string_issues[tf_string] = (no_trn, no_link, no_gene)
+            no_trn, no_link, no_gene = tf_string_issues[tf_string]
 
             tfs_to_add = set(no_trn + no_link + no_gene)
 
@@ -324,7 +347,8 @@ def imodulondb_compatibility(model, inplace=False, tfcomplex_to_gene=None):
                 for col, tf_set in zip(cols, [no_trn, no_link, no_gene]):
                     if tf in tf_set:
                         row[col] = False
-                tf_issues.loc[tf] = row
+                tf_rows[tf] = row
+    tf_issues = pd.DataFrame.from_dict(tf_rows, orient="index", columns=cols)
 
     return table_issues, tf_issues, missing_g_links, missing_DOIs
 
@@ -336,6 +360,7 @@ def imodulondb_export(
     tfcomplex_to_gene=None,
     skip_iMs=False,
     skip_genes=False,
+    max_workers=1,
 ):
 
     """
@@ -360,6 +385,11 @@ def imodulondb_export(
         If this is True, do not output iModulon files (to save time)
     skip_genes : bool, optional
         If this is True, do not output gene files (to save time)
+    max_workers : int, optional
+        Number of processes used to write the iModulon and gene files. If
+        None, uses all available cores. When running a script with more than
+        one worker, call this function under ``if __name__ == "__main__":``
+        (default = 1)
 
     Returns
     -------
@@ -386,12 +416,14 @@ def imodulondb_export(
     if not (skip_iMs):
         print("Writing iModulon page files (1/2)")
 
-        imdb_generate_im_files(model1, folder, "start", tfcomplex_to_gene)
+        imdb_generate_im_files(
+            model1, folder, "start", tfcomplex_to_gene, max_workers=max_workers
+        )
 
     if not (skip_genes):
         print("Writing Gene page files (2/2)")
 
-        imdb_generate_gene_files(model1, folder)
+        imdb_generate_gene_files(model1, folder, max_workers=max_workers)
 
     print(
         "Complete! (Organism = {}; Dataset = {})".format(
@@ -491,9 +523,11 @@ def imdb_iM_table(imodulon_table, cat_order=None):
 
     if cat_order is not None:
         cat_dict = {val: i for i, val in enumerate(cat_order)}
-        im_table.loc[:, "category_num"] = [
-            cat_dict[im_table.category[k]] for k in im_table.index
-        ]
+        category_num = im_table.category.map(cat_dict)
+        if category_num.isna().any():
+            missing = im_table.category[category_num.isna()].unique().tolist()
+            raise KeyError("Categories missing from cat_order: {}".format(missing))
+        im_table.loc[:, "category_num"] = category_num
     else:
         try:
             im_table.loc[:, "category_num"] = imodulon_table["new_idx"]
@@ -521,10 +555,12 @@ def imdb_gene_presence(model):
         Table mapping genes to iModulons
     """
     mbin = model.M_binarized.astype(bool)
-    mbin_list = pd.DataFrame(columns=["iModulon", "Gene"])
-    for k in mbin.columns:
-        for g in mbin.index[mbin[k]]:
-            mbin_list = mbin_list.append({"iModulon": k, "Gene": g}, ignore_index=True)
+
+    # List genes in each iModulon, grouped by iModulon
+    im_idx, gene_idx = np.nonzero(mbin.values.T)
+    mbin_list = pd.DataFrame(
+        {"iModulon": mbin.columns[im_idx], "Gene": mbin.index[gene_idx]}
+    )
     return mbin, mbin_list
 
 
@@ -573,20 +609,11 @@ def imodulondb_main_site_files(
         if not (os.path.isdir(gene_folder)):
             os.makedirs(gene_folder)
 
-        # add files to the folder
-        model.gene_table.to_csv(os.path.join(gene_folder, "gene_info.csv"))
-        try:
-            model.trn.to_csv(os.path.join(gene_folder, "trn.csv"))
-        except FileNotFoundError:
-            pass
-
-        # zip the folder
-        old_cwd = os.getcwd()
-        os.chdir(gene_folder)
-        with ZipFile("../gene_files.zip", "w") as z:
-            z.write("gene_info.csv")
-            z.write("trn.csv")
-        os.chdir(old_cwd)
+        # add files to the folder, and zip them
+        gene_files = {"gene_info.csv": model.gene_table, "trn.csv": model.trn}
+        _write_zipped_csvs(
+            gene_files, gene_folder, os.path.join(annot_folder, "gene_files.zip")
+        )
 
     main_folder = os.path.join(organism_folder, dataset)
     if not (os.path.isdir(main_folder)):
@@ -596,39 +623,28 @@ def imodulondb_main_site_files(
     dataset_meta = imdb_dataset_table(model)
     dataset_meta.to_csv(os.path.join(main_folder, "dataset_meta.csv"))
     # num_ims - used so that the 'next iModulon' button doesn't overflow
-    file = open(main_folder + "/num_ims.txt", "w")
-    file.write(str(model.M.shape[1]))
-    file.close()
+    with open(os.path.join(main_folder, "num_ims.txt"), "w") as f:
+        f.write(str(model.M.shape[1]))
 
     # save the dataset files in the data folder
     data_folder = os.path.join(main_folder, "data_files")
     if not (os.path.isdir(data_folder)):
         os.makedirs(data_folder)
 
-    model.X.to_csv(os.path.join(data_folder, "log_tpm.csv"))
-    model.A.to_csv(os.path.join(data_folder, "A.csv"))
-    model.M.to_csv(os.path.join(data_folder, "M.csv"))
-    im_table = imdb_iM_table(model.imodulon_table, cat_order)
-    im_table.to_csv(os.path.join(data_folder, "iM_table.csv"))
-    model.sample_table.to_csv(os.path.join(data_folder, "sample_table.csv"))
     mbin, mbin_list = imdb_gene_presence(model)
-    mbin.to_csv(os.path.join(data_folder, "gene_presence_matrix.csv"))
-    mbin_list.to_csv(os.path.join(data_folder, "gene_presence_list.csv"))
-    pd.Series(model.thresholds).to_csv(os.path.join(data_folder, "M_thresholds.csv"))
-
-    # zip the data folder
-    old_cwd = os.getcwd()
-    os.chdir(data_folder)
-    with ZipFile("../data_files.zip", "w") as z:
-        z.write("log_tpm.csv")
-        z.write("A.csv")
-        z.write("M.csv")
-        z.write("iM_table.csv")
-        z.write("sample_table.csv")
-        z.write("gene_presence_list.csv")
-        z.write("gene_presence_matrix.csv")
-        z.write("M_thresholds.csv")
-    os.chdir(old_cwd)
+    data_files = {
+        "log_tpm.csv": model.X,
+        "A.csv": model.A,
+        "M.csv": model.M,
+        "iM_table.csv": imdb_iM_table(model.imodulon_table, cat_order),
+        "sample_table.csv": model.sample_table,
+        "gene_presence_list.csv": mbin_list,
+        "gene_presence_matrix.csv": mbin,
+        "M_thresholds.csv": pd.Series(model.thresholds),
+    }
+    _write_zipped_csvs(
+        data_files, data_folder, os.path.join(main_folder, "data_files.zip")
+    )
 
     # make iModulons searchable
     enrich_df = model.imodulon_table.copy()
@@ -640,9 +656,10 @@ def imodulondb_main_site_files(
     except TypeError:
         enrich_df["name"] = enrich_df["name"].astype(str)
         enrich_df = enrich_df.sort_values(by="name").fillna(value="N/A")
-    if not (os.path.isdir(main_folder + "/iModulon_files")):
-        os.makedirs(main_folder + "/iModulon_files")
-    enrich_df.to_json(main_folder + "/iModulon_files/im_list.json", orient="records")
+    im_folder = os.path.join(main_folder, "iModulon_files")
+    if not (os.path.isdir(im_folder)):
+        os.makedirs(im_folder)
+    enrich_df.to_json(os.path.join(im_folder, "im_list.json"), orient="records")
 
     # make genes searchable
     gene_df = model.gene_table.copy()
@@ -650,42 +667,160 @@ def imodulondb_main_site_files(
     gene_df["gene_id"] = gene_df.index
     gene_df = gene_df[["gene_name", "gene_id", "gene_product"]]
     gene_df = gene_df.sort_values(by="gene_name").fillna(value="not available")
-    if not (os.path.isdir(main_folder + "/gene_page_files")):
-        os.makedirs(main_folder + "/gene_page_files")
-    gene_df.to_json(main_folder + "/gene_page_files/gene_list.json", orient="records")
+    gene_page_folder = os.path.join(main_folder, "gene_page_files")
+    if not (os.path.isdir(gene_page_folder)):
+        os.makedirs(gene_page_folder)
+    gene_df.to_json(os.path.join(gene_page_folder, "gene_list.json"), orient="records")
 
     # make the html
-    html = '<div class="panel">\n'
-    html += '  <div class="panel-header">\n'
-    html += '    <h2 class="mb-0">\n'
-    html += '      <button class="btn btn-link collapsed organism" type="button"'
-    html += ' data-toggle="collapse" data-target="#new_org" aria-expanded="false"'
-    html += ' aria-controls="new_org">\n        <i>'
-    html += model.imodulondb_table["organism"]
-    html += "</i>\n      </button>\n    </h2>\n  </div>\n"
-    html += '  <div id="new_org" class="collapse" aria-labelledby="headingThree"'
-    html += ' data-parent="#organismAccordion">\n'
-    html += '    <div class="panel-body">\n'
-    html += '      <ul class="nav navbar-dark flex-column">\n'
-    html += '          <li class="nav-item dataset">\n'
-    html += '              <a class="nav-link active" href="dataset.html?organism='
-    html += organism
-    html += "&dataset="
-    html += dataset
-    html += '"><i class="fas fa-angle-right pr-2"></i>'
-    html += model.imodulondb_table["dataset"]
-    html += "\n              </a>\n          </li>\n"
-    html += "      </ul>\n    </div>\n  </div>\n</div>"
-
-    file = open(main_folder + "/html_for_splash.html", "w")
-    file.write(html)
-    file.close()
+    html = "".join(
+        [
+            '<div class="panel">\n',
+            '  <div class="panel-header">\n',
+            '    <h2 class="mb-0">\n',
+            '      <button class="btn btn-link collapsed organism" type="button"',
+            ' data-toggle="collapse" data-target="#new_org" aria-expanded="false"',
+            ' aria-controls="new_org">\n        <i>',
+            model.imodulondb_table["organism"],
+            "</i>\n      </button>\n    </h2>\n  </div>\n",
+            '  <div id="new_org" class="collapse" aria-labelledby="headingThree"',
+            ' data-parent="#organismAccordion">\n',
+            '    <div class="panel-body">\n',
+            '      <ul class="nav navbar-dark flex-column">\n',
+            '          <li class="nav-item dataset">\n',
+            '              <a class="nav-link active" href="dataset.html?organism=',
+            organism,
+            "&dataset=",
+            dataset,
+            '"><i class="fas fa-angle-right pr-2"></i>',
+            model.imodulondb_table["dataset"],
+            "\n              </a>\n          </li>\n",
+            "      </ul>\n    </div>\n  </div>\n</div>",
+        ]
+    )
+
+    with open(os.path.join(main_folder, "html_for_splash.html"), "w") as f:
+        f.write(html)
 
     return main_folder
 
 
+def _write_zipped_csvs(tables, folder, zip_path, max_cells=10**6):
+    """
+    Writes each table to a CSV file in folder, and stores the same CSV text
+    in a zip file, so that each table is only formatted once. Tables with more
+    than max_cells values (e.g. the expression matrix) are streamed to disk
+    in chunks and then copied into the zip file, to bound memory usage.
+
+    Parameters
+    ----------
+    tables : dict
+        Dictionary of file names to DataFrames or Series
+    folder : str
+        Folder in which to save the CSV files
+    zip_path : str
+        Path to the zip file
+    max_cells : int, optional
+        Maximum number of values in a table to format in memory
+        (default = 10**6)
+
+    Returns
+    -------
+    None: None
+    """
+
+    with ZipFile(zip_path, "w", compression=ZIP_DEFLATED) as z:
+        for filename, table in tables.items():
+            csv_path = os.path.join(folder, filename)
+            if table.size > max_cells:
+                table.to_csv(csv_path)
+                z.write(csv_path, arcname=filename)
+            else:
+                text = table.to_csv()
+                with open(csv_path, "w", encoding="utf-8", newline="") as f:
+                    f.write(text)
+                z.writestr(filename, text)
+
+
+# Page function, model and extra arguments of a _generate_pages worker process
+_page_worker = None
+
+
+def _init_page_worker(page_func, model, args):
+    """
+    Stores the page inputs in a worker process, so that the model is only
+    sent once per worker rather than with every chunk of pages
+    """
+    global _page_worker
+    _page_worker = (page_func, model, args)
+
+
+def _generate_page_chunk(keys):
+    """
+    Runs page_func(model, key, *args) for each key, using the inputs stored by
+    _init_page_worker. Used as a single worker task
+    """
+    page_func, model, args = _page_worker
+    for key in keys:
+        page_func(model, key, *args)
+    return len(keys)
+
+
+def _generate_pages(page_func, model, keys, args=(), max_workers=1):
+    """
+    Runs page_func(model, key, *args) for each key, with a progress bar
+
+    Parameters
+    ----------
+    page_func : function
+        Function that generates the files for one page
+    model : :class:`~pymodulon.core.IcaData`
+        IcaData object
+    keys : list
+        iModulons or genes to generate pages for
+    args : tuple, optional
+        Additional arguments passed to page_func (default = ())
+    max_workers : int, optional
+        Number of processes to use. If None, uses all available cores; if 1,
+        pages are generated in the current process (default = 1)
+
+    Returns
+    -------
+    None: None
+    """
+
+    keys = list(keys)
+    if max_workers == 1:
+        for key in tqdm(keys):
+            page_func(model, key, *args)
+        return
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    # Split pages into a few chunks per worker to balance the load
+    n_chunks = min(len(keys), 4 * max_workers)
+    chunks = [keys[i::n_chunks] for i in range(n_chunks)]
+
+    # Workers are spawned rather than forked, since forking after numba has
+    # started its threading layer can deadlock
+    pool = get_context("spawn").Pool(
+        max_workers,
+        initializer=_init_page_worker,
+        initargs=(page_func, model, args),
+    )
+    with pool:
+        with tqdm(total=len(keys)) as pbar:
+            for n_pages in pool.imap_unordered(_generate_page_chunk, chunks):
+                pbar.update(n_pages)
+
+
 def imdb_generate_im_files(
-    model, path_prefix=".", gene_scatter_x="start", tfcomplex_to_gene=None
+    model,
+    path_prefix=".",
+    gene_scatter_x="start",
+    tfcomplex_to_gene=None,
+    max_workers=1,
 ):
     """
     Generates all files for all iModulons in data
@@ -703,15 +838,28 @@ def imdb_generate_im_files(
         dictionary pointing complex TRN entries
         to matching gene names in the gene table
         ex: {"FlhDC":"flhD"}
+    max_workers : int, optional
+        Number of processes used to generate the files. If None, uses all
+        available cores (default = 1)
 
     """
     if tfcomplex_to_gene is None:
         tfcomplex_to_gene = {}
-    for k in tqdm(model.imodulon_table.index):
-        make_im_directory(model, k, path_prefix, gene_scatter_x, tfcomplex_to_gene)
 
+    # look up the targets of each regulator once, rather than once per iModulon
+    tf2genes = {
+        tf: genes.values for tf, genes in model.trn.groupby("regulator")["gene_id"]
+    }
+    _generate_pages(
+        make_im_directory,
+        model,
+        model.imodulon_table.index,
+        (path_prefix, gene_scatter_x, tfcomplex_to_gene, tf2genes),
+        max_workers,
+    )
 
-def imdb_generate_gene_files(model, path_prefix="."):
+
+def imdb_generate_gene_files(model, path_prefix=".", max_workers=1):
     """
     Generates all files for all iModulons in IcaData object
 
@@ -721,14 +869,24 @@ def imdb_generate_gene_files(model, path_prefix="."):
         IcaData object
     path_prefix : str, optional
         Dataset folder in which to store the files (default = ".")
+    max_workers : int, optional
+        Number of processes used to generate the files. If None, uses all
+        available cores (default = 1)
 
     Returns
     -------
     None
     """
 
-    for g in tqdm(model.M.index):
-        make_gene_directory(model, g, path_prefix)
+    # the iModulon tables are the same for all genes
+    im_table_short, m_bin = _gene_im_tables(model)
+    _generate_pages(
+        make_gene_directory,
+        model,
+        model.M.index,
+        (path_prefix, im_table_short, m_bin),
+        max_workers,
+    )
 
 
 ###################################################
@@ -738,7 +896,7 @@ def imdb_generate_gene_files(model, path_prefix="."):
 # Gene Table
 
 
-def parse_tf_string(model, tf_str, verbose=False):
+def parse_tf_string(model, tf_str, verbose=False, trn_regs=None):
     """
     Returns a list of relevant tfs from a string. Will ignore TFs not in the
     trn file.
@@ -752,6 +910,9 @@ def parse_tf_string(model, tf_str, verbose=False):
         String of tfs joined by '+' and '/' operators
     verbose : bool, optional
         Whether or nor to print outputs
+    trn_regs : set, optional
+        Set of regulators in model.trn, to avoid recomputing it when parsing
+        many strings (default: None)
 
     Returns
     -------
@@ -764,29 +925,29 @@ def parse_tf_string(model, tf_str, verbose=False):
     if tf_str == "":
         return [], []
 
+    if trn_regs is None:
+        trn_regs = set(model.trn.regulator)
+
     tf_str = tf_str.replace("[", "").replace("]", "")
-    tfs = re.split("[+/]", tf_str)
+    tfs = _TF_SPLIT.split(tf_str)
 
     # Check if there is an issue, just remove the issues for now.
-    bad_tfs = []
-    for tf in tfs:
-        tf = tf.strip()
-        if tf not in model.trn.regulator.unique():
-            if verbose:
-                print("Regulator not in TRN:", tf)
-                print(
-                    "To remedy this, add rows to the TRN for each gene associated "
-                    "with this regulator. Otherwise, it will be ignored in the gene"
-                    "tables and histograms."
-                )
-            bad_tfs.append(tf)
-    tfs = [t.strip() for t in list(set(tfs) - set(bad_tfs))]
-    bad_tfs = list(set(bad_tfs))
+    bad_tfs = {tf.strip() for tf in tfs} - trn_regs
+    if verbose:
+        for tf in bad_tfs:
+            print("Regulator not in TRN:", tf)
+            print(
+                "To remedy this, add rows to the TRN for each gene associated "
+                "with this regulator. Otherwise, it will be ignored in the gene"
+                "tables and histograms."
+            )
+    tfs = [t.strip() for t in set(tfs) - bad_tfs]
+    bad_tfs = list(bad_tfs)
 
     return tfs, bad_tfs
 
 
-def imdb_gene_table_df(model, k):
+def imdb_gene_table_df(model, k, tf2genes=None):
     """
     Creates the gene table dataframe for iModulonDB
     Parameters
@@ -795,6 +956,9 @@ def imdb_gene_table_df(model, k):
         IcaData object
     k : int or str
         iModulon name
+    tf2genes : dict, optional
+        Dictionary mapping each regulator in the TRN to its target genes. If
+        None, targets are looked up in model.trn (default = None)
 
     Returns
     -------
@@ -825,8 +989,11 @@ def imdb_gene_table_df(model, k):
 
     # add TFs
     for tf in tfs:
-        reg_genes = model.trn.gene_id[model.trn.regulator == tf].values
-        res[tf] = [i in reg_genes for i in res.index]
+        if tf2genes is None:
+            reg_genes = model.trn.gene_id[model.trn.regulator == tf]
+        else:
+            reg_genes = tf2genes.get(tf, [])
+        res[tf] = res.index.isin(reg_genes)
 
     # add links
     res["link"] = [model.gene_links[g] for g in res.index]
@@ -859,26 +1026,62 @@ def _component_DF(model, k, tfs=None):
         Gene table for the iModulon
     """
 
-    df = pd.DataFrame(model.M[k].sort_values())
-    df.columns = ["gene_weight"]
-    if "gene_product" in model.gene_table.columns:
-        df["gene_product"] = model.gene_table["gene_product"]
-    if "gene_name" in model.gene_table.columns:
-        df["gene_name"] = model.gene_table["gene_name"]
-    if "operon" in model.gene_table.columns:
-        df["operon"] = model.gene_table["operon"]
-    if "length" in model.gene_table.columns:
-        df["length"] = model.gene_table.length
-    if "regulator" in model.gene_table.columns:
-        df["regulator"] = model.gene_table.regulator.fillna("")
+    gene_weights = model.M[k].sort_values()
+
+    # add gene info with a single reindex
+    info_cols = [
+        col
+        for col in ["gene_product", "gene_name", "operon", "length", "regulator"]
+        if col in model.gene_table.columns
+    ]
+    df = model.gene_table.reindex(gene_weights.index, columns=info_cols)
+    df.insert(0, "gene_weight", gene_weights)
+    if "regulator" in df.columns:
+        df["regulator"] = df.regulator.fillna("")
 
     if tfs is not None:
         for tf in tfs:
-            df[tf] = [tf in regs.split(",") for regs in df["regulator"]]
+            pattern = r"(?:^|,){}(?:,|$)".format(re.escape(tf))
+            df[tf] = df["regulator"].str.contains(pattern, regex=True)
 
     return df.sort_values("gene_weight")
 
 
+def _gene_list_string(genes):
+    """
+    Formats gene names as np.array2string(np.array(genes), separator=" ")
+    does, without going through the numpy printer. Helper function for
+    imdb_gene_hist_df and imdb_regulon_venn_df.
+
+    Parameters
+    ----------
+    genes : list
+        List of gene names
+
+    Returns
+    -------
+    str
+        Space-separated, quoted gene names in brackets. Lines are wrapped at
+        75 characters, and lists of more than 1000 genes are summarized.
+    """
+
+    words = [repr(str(g)) for g in genes]
+    if len(words) > 1000:
+        words = words[:3] + ["..."] + words[-3:]
+
+    lines = []
+    line = " "
+    for i, word in enumerate(words):
+        if len(line) > 1 and len(line) + len(word) > 74:
+            lines.append(line.rstrip())
+            line = " "
+        line += word
+        if i < len(words) - 1:
+            line += " "
+    lines.append(line)
+    return "[" + "\n".join(lines)[1:] + "]"
+
+
 def _tf_combo_string(row):
     """
     Creates a formatted string for the histogram legends. Helper function for
@@ -925,24 +1128,24 @@ def _sort_tf_strings(tfs, unique_elts):
     # unreg always goes first
     unique_elts.remove("unreg")
     sorted_elts = ["unreg"]
+    remaining = set(unique_elts)
 
     # then the individual TFs
     for tf in tfs:
-        if tf in unique_elts:
+        if tf in remaining:
             sorted_elts.append(tf)
-            unique_elts.remove(tf)
+            remaining.discard(tf)
 
     # then pairs
-    pairs = [i for i in unique_elts if "," not in i]
     for i in tfs:
         for j in tfs:
             name = i + " and " + j
-            if name in pairs:
+            if name in remaining and "," not in name:
                 sorted_elts.append(name)
-                unique_elts.remove(name)
+                remaining.discard(name)
 
     # then longer combos, which won't be sorted for now
-    return sorted_elts + unique_elts
+    return sorted_elts + [elt for elt in unique_elts if elt in remaining]
 
 
 def imdb_gene_hist_df(model, k, bins=20, tol=0.001):
@@ -983,13 +1186,28 @@ def imdb_gene_hist_df(model, k, bins=20, tol=0.001):
     if len(tfs) == 0:
         DF_gene["tf_combos"] = ["unreg"] * DF_gene.shape[0]
     else:
-        tf_bools = DF_gene[tfs]
-        DF_gene["tf_combos"] = [
-            _tf_combo_string(tf_bools.loc[g]) for g in tf_bools.index
-        ]
+        # only format each distinct combination of TFs once
+        tf_bools = DF_gene[tfs].values.astype(bool)
+        if len(tfs) < 63:
+            # pack each gene's TFs into a bitmask, and unpack the distinct ones
+            tf_bits = np.arange(len(tfs), dtype=np.int64)
+            codes, combo_idx = np.unique(
+                tf_bools.dot(1 << tf_bits), return_inverse=True
+            )
+            combos = ((codes[:, None] >> tf_bits) & 1).astype(bool)
+        else:
+            combos, combo_idx = np.unique(tf_bools, axis=0, return_inverse=True)
+        combo_strings = np.array(
+            [_tf_combo_string(pd.Series(c, index=tfs)) for c in combos],
+            dtype=object,
+        )
+        DF_gene["tf_combos"] = combo_strings[combo_idx]
+
+    # encode the tf combos as integers, in order of appearance
+    combo_codes, combo_names = pd.factorize(DF_gene.tf_combos)
 
     # get the list of tf combos in the correct order
-    tf_combo_order = _sort_tf_strings(tfs, list(DF_gene.tf_combos.unique()))
+    tf_combo_order = _sort_tf_strings(tfs, list(combo_names))
 
     # compute bins
     xmin = min(min(DF_gene.gene_weight), -model.thresholds[k])
@@ -1005,50 +1223,40 @@ def imdb_gene_hist_df(model, k, bins=20, tol=0.001):
     # column headers: bin middles
     columns = np.arange(xmin + width / 2, xmax + width / 2, width)[:bins]
     index = ["thresh"] + tf_combo_order + [i + "_genes" for i in tf_combo_order]
-    res = pd.DataFrame(index=index, columns=columns)
+    data = np.empty((len(index), len(columns)), dtype=object)
 
     # row 0: threshold indices and number of unique tf combos
     thresh1 = -model.thresholds[k]
     thresh2 = model.thresholds[k]
     num_combos = len(tf_combo_order)
-    res.loc["thresh"] = [thresh1, thresh2, num_combos] + [np.nan] * (len(columns) - 3)
-
-    # next set of rows: heights of bars
-    for r in tf_combo_order:
-        res.loc[r] = np.histogram(
-            DF_gene.gene_weight[DF_gene.tf_combos == r], bins, (xmin, xmax)
-        )[0]
-
-    # last set of rows: gene names
-    for b_mid in columns:
-
-        # get the bin bounds
-        b_lower = b_mid - width / 2
-        b_upper = b_lower + width
-        for r in tf_combo_order:
-            # get the genes for this regulator and bin
-            genes = DF_gene.index[
-                (DF_gene.tf_combos == r)
-                & (DF_gene.gene_weight < b_upper)
-                & (DF_gene.gene_weight > b_lower)
-            ]
-            # use the gene names, and get them with num2name (more robust)
-            genes = [model.num2name(g) for g in genes]
-
-            res.loc[r, b_mid] = len(genes)
-
-            gene_list = np.array2string(np.array(genes), separator=" ")
+    data[0] = [thresh1, thresh2, num_combos] + [np.nan] * (len(columns) - 3)
+
+    # remaining rows: heights of bars and gene names. Genes are sorted by
+    # weight, so the genes of each tf combo in a bin form a contiguous slice
+    weights = DF_gene.gene_weight.values
+    gene_order = np.argsort(combo_codes, kind="stable")
+    combo_bounds = np.cumsum(np.bincount(combo_codes))[:-1]
+    combo_positions = dict(zip(combo_names, np.split(gene_order, combo_bounds)))
+    # use the gene names, and get them with num2name (more robust)
+    names = np.array(model.num2name(DF_gene.index.tolist()), dtype=object)
+    b_lowers = columns - width / 2
+    b_uppers = b_lowers + width
+    # don't list unregulated genes unless they are in the i-modulon
+    in_imodulon = (b_lowers + tol >= model.thresholds[k]) | (
+        b_uppers - tol <= -model.thresholds[k]
+    )
+    for i_r, r in enumerate(tf_combo_order):
+        r_idx = combo_positions[r]
+        starts = np.searchsorted(weights[r_idx], b_lowers, side="right")
+        ends = np.maximum(np.searchsorted(weights[r_idx], b_uppers), starts)
+        data[1 + i_r] = ends - starts
+        data[1 + num_combos + i_r] = [
+            _gene_list_string(names[r_idx[i:j]]) if r != "unreg" or in_bin else "[]"
+            for i, j, in_bin in zip(starts, ends, in_imodulon)
+        ]
 
-            # don't list unregulated genes unless they are in the i-modulon
-            if r == "unreg":
-                if (b_lower + tol >= model.thresholds[k]) or (
-                    b_upper - tol <= -model.thresholds[k]
-                ):
-                    res.loc[r + "_genes", b_mid] = gene_list
-                else:
-                    res.loc[r + "_genes", b_mid] = "[]"
-            else:
-                res.loc[r + "_genes", b_mid] = gene_list
+    # assemble the table once all rows are filled in
+    res = pd.DataFrame(data, index=index, columns=columns)
     return res
 
 
@@ -1057,7 +1265,7 @@ def imdb_gene_hist_df(model, k, bins=20, tol=0.001):
 
 def _gene_color_dict(model):
     """
-    Helper function to match genes to colors based on COG. Used by
+    Helper function to match genes to hex colors based on COG. Used by
     imdb_gene_scatter_df.
 
     Parameters
@@ -1068,17 +1276,17 @@ def _gene_color_dict(model):
     Returns
     -------
     dict
-        Dictionary associating gene names to colors
+        Dictionary associating gene names to hex colors
 
     """
 
     try:
         gene_cogs = model.gene_table.cog.to_dict()
     except AttributeError:
-        return {k: "dodgerblue" for k in model.gene_table.index}
+        return dict.fromkeys(model.gene_table.index, to_hex("dodgerblue"))
 
     try:
-        return {k: model.cog_colors[v] for k, v in gene_cogs.items()}
+        cog_colors = {cog: model.cog_colors[cog] for cog in set(gene_cogs.values())}
     except (KeyError, AttributeError):
         # previously, this would call the setter using:
         # data.cog_colors = None
@@ -1114,7 +1322,12 @@ def _gene_color_dict(model):
                 ],
             )
         )
-        return {k: model.cog_colors[v] for k, v in gene_cogs.items()}
+        cog_colors = model.cog_colors
+
+    # only convert each COG's color once. Colors are looked up by COG, since
+    # user-set colors may be unhashable (e.g. RGB lists or arrays)
+    cog_hex = {cog: to_hex(color) for cog, color in cog_colors.items()}
+    return {k: cog_hex[v] for k, v in gene_cogs.items()}
 
 
 def imdb_gene_scatter_df(model, k, gene_scatter_x="start"):
@@ -1155,19 +1368,18 @@ def imdb_gene_scatter_df(model, k, gene_scatter_x="start"):
     res.y = model.M[k]
 
     # add other data
-    res.name = [model.num2name(i) for i in res.index]
+    res.name = model.num2name(res.index.tolist())
     try:
         res.cog = model.gene_table.cog[res.index]
     except AttributeError:
         res.cog = "Unknown"
 
     gene_colors = _gene_color_dict(model)
-    res.color = [to_hex(gene_colors[gene]) for gene in res.index]
+    res.color = [gene_colors[gene] for gene in res.index]
 
     # if the gene is in the iModulon, it is clickable
     in_im = res.index[res.y.abs() > cutoff]
-    for g in in_im:
-        res.loc[g, "link"] = model.gene_links[g]
+    res.loc[in_im, "link"] = [model.gene_links[g] for g in in_im]
 
     # add a row to store the threshold
     cutoff_row = pd.DataFrame(
@@ -1196,8 +1408,19 @@ def generate_n_replicates_column(model):
     """
 
     try:
-        for name, group in model.sample_table.groupby(["project", "condition"]):
-            model.sample_table.loc[group.index, "n_replicates"] = group.shape[0]
+        # count the samples of each condition in one pass. Samples without a
+        # project or condition are not in any group, and keep their value
+        n_replicates = model.sample_table.groupby(["project", "condition"])[
+            "project"
+        ].transform("count")
+        if "n_replicates" not in model.sample_table.columns:
+            model.sample_table["n_replicates"] = np.nan
+        # keep the column's dtype, as assigning every row replaces the column
+        in_cond = n_replicates.notna()
+        dtype = model.sample_table["n_replicates"].dtype
+        model.sample_table.loc[in_cond, "n_replicates"] = n_replicates[in_cond].astype(
+            dtype
+        )
     except KeyError:
         logging.warning(
             "Unable to write n_replicates column. Add"
@@ -1205,6 +1428,65 @@ def generate_n_replicates_column(model):
         )
 
 
+def _activity_bar_df(values, samp_table, name):
+    """
+    Helper function for imdb_activity_bar_df and imdb_gene_activity_bar_df
+
+    Parameters
+    ----------
+    values : ~pandas.Series
+        Activities or expression values, indexed by sample position
+    samp_table : ~pandas.DataFrame
+        Sample table with a positional index
+    name : str
+        Name of the values in the column headers ("A" or "X")
+
+    Returns
+    -------
+    res: ~pandas.DataFrame
+        A dataframe for producing an activity bar graph for iModulonDB
+    """
+
+    max_replicates = int(samp_table["n_replicates"].max())
+    columns = [name + "_avg", name + "_std", "n"] + list(
+        chain(
+            *[
+                ["rep{}_idx".format(i), "rep{}_{}".format(i, name)]
+                for i in range(1, max_replicates + 1)
+            ]
+        )
+    )
+
+    # compute statistics for all conditions at once
+    grouped = values.groupby(
+        [samp_table["project"], samp_table["condition"]], sort=False
+    )
+    stats = pd.DataFrame(
+        {"mean": grouped.mean(), "std": grouped.std(), "n": grouped.size()}
+    )
+    data = np.full((len(stats), len(columns)), np.nan)
+    data[:, :3] = stats.values
+
+    # fill in individual samples (indices and values). Samples with a missing
+    # project or condition are not in any group, and get NaN positions
+    cond_idx = grouped.ngroup().values
+    in_cond = ~np.isnan(cond_idx)
+    cond_idx = cond_idx[in_cond].astype(int)
+    rep_idx = grouped.cumcount().values[in_cond].astype(int)
+    rep_cols = 3 + 2 * rep_idx
+    data[cond_idx, rep_cols] = samp_table.index[in_cond]
+    data[cond_idx, rep_cols + 1] = values.values[in_cond]
+
+    # clean up
+    cond_names = [proj + "__" + cond for proj, cond in stats.index]
+    res = pd.DataFrame(
+        data, index=pd.Index(cond_names, name="condition"), columns=columns
+    )
+    res = res.reset_index()
+
+    return res
+
+
 def imdb_activity_bar_df(model, k):
     """
     Generates a dataframe for the activity bar graph of iModulon k
@@ -1226,48 +1508,41 @@ def imdb_activity_bar_df(model, k):
 
     # get the row of A
     A_k = model.A.loc[k]
-    A_k = A_k.rename(dict(zip(A_k.index, samp_table.index)))
+    A_k = A_k.set_axis(samp_table.index)
 
-    # initialize the dataframe
-    max_replicates = int(samp_table["n_replicates"].max())
-    columns = ["A_avg", "A_std", "n"] + list(
-        chain(
-            *[
-                ["rep{}_idx".format(i), "rep{}_A".format(i)]
-                for i in range(1, max_replicates + 1)
-            ]
-        )
-    )
-    res = pd.DataFrame(columns=columns)
+    return _activity_bar_df(A_k, samp_table, "A")
 
-    # iterate through conditions and fill in rows
-    for cond, group in samp_table.groupby(["project", "condition"], sort=False):
 
-        # get condition name and A values
-        cond_name = cond[0] + "__" + cond[1]  # project__cond
-        vals = A_k[group.index]
-
-        # compute statistics
-        new_row = [vals.mean(), vals.std(), len(vals)]
-
-        # fill in individual samples (indices and values)
-        for idx in group.index:
-            new_row += [idx, vals[idx]]
-        new_row += [np.nan] * ((max_replicates - len(vals)) * 2)
+# Regulon Venn Diagram
 
-        res.loc[cond_name] = new_row
 
-    # clean up
-    res.index.name = "condition"
-    res = res.reset_index()
+def _trn_targets(model, tf, tf2genes=None):
+    """
+    Gets the set of genes regulated by a single regulator. Helper function for
+    _get_reg_genes and _parse_regulon_string.
 
-    return res
+    Parameters
+    ----------
+    model : :class:`~pymodulon.core.IcaData`
+        IcaData object
+    tf : str
+        Regulator name
+    tf2genes : dict, optional
+        Dictionary mapping each regulator in the TRN to its target genes. If
+        None, targets are looked up in model.trn (default = None)
 
+    Returns
+    -------
+    set
+        Set of genes regulated by tf
+    """
 
-# Regulon Venn Diagram
+    if tf2genes is None:
+        return set(model.trn.gene_id[model.trn.regulator == tf])
+    return set(tf2genes.get(tf, []))
 
 
-def _parse_regulon_string(model, s):
+def _parse_regulon_string(model, s, tf2genes=None):
     """
     The Bacillus microarray dataset uses [] to create unusually complicated
     TF strings. This function parses those, as a helper to _get_reg_genes for
@@ -1279,6 +1554,8 @@ def _parse_regulon_string(model, s):
         IcaData object
     s : str
         TF string
+    tf2genes : dict, optional
+        Passed to _trn_targets() (default = None)
 
     Returns
     -------
@@ -1298,18 +1575,16 @@ def _parse_regulon_string(model, s):
     for r in union:
         if "+" in r:
             intersection = r.split(" + ")
-            genes = set(model.trn.gene_id[model.trn.regulator == intersection[0]])
+            genes = _trn_targets(model, intersection[0], tf2genes)
             for i in intersection[1:]:
-                genes = genes.intersection(
-                    set(model.trn.gene_id[model.trn.regulator == i])
-                )
+                genes = genes.intersection(_trn_targets(model, i, tf2genes))
         else:
-            genes = set(model.trn.gene_id[model.trn.regulator == r])
+            genes = _trn_targets(model, r, tf2genes)
         res = res.union(genes)
     return res
 
 
-def _get_reg_genes(model, tf):
+def _get_reg_genes(model, tf, tf2genes=None):
     """
     Finds the set of genes regulated by the boolean combination of regulators
     in a TF string
@@ -1320,6 +1595,8 @@ def _get_reg_genes(model, tf):
         IcaData object
     tf : str
         string of TFs separated by +, /, and/or []
+    tf2genes : dict, optional
+        Passed to _trn_targets() (default = None)
 
     Returns
     -------
@@ -1329,33 +1606,27 @@ def _get_reg_genes(model, tf):
 
     # the Bacillus tf strings use '[]' to make complicated boolean combinations
     if "[" in tf:
-        reg_genes = _parse_regulon_string(model, tf)
+        reg_genes = _parse_regulon_string(model, tf, tf2genes)
 
     # other datasets can use this simpler code
     else:
         tf = tf.strip()
         if "+" in tf:
-            reg_list = []
-            for tfx in tf.split("+"):
-                tfx = tfx.strip()
-                reg_list.append(
-                    set(model.trn[model.trn.regulator == tfx].gene_id.unique())
-                )
-            reg_genes = set.intersection(*reg_list)
+            reg_genes = set.intersection(
+                *[_trn_targets(model, t.strip(), tf2genes) for t in tf.split("+")]
+            )
         elif "/" in tf:
-            reg_genes = set(
-                model.trn[
-                    model.trn.regulator.isin([t.strip() for t in tf.split("/")])
-                ].gene_id.unique()
+            reg_genes = set().union(
+                *[_trn_targets(model, t.strip(), tf2genes) for t in tf.split("/")]
             )
         else:
-            reg_genes = set(model.trn[model.trn.regulator == tf].gene_id.unique())
+            reg_genes = _trn_targets(model, tf, tf2genes)
 
     # return result
     return reg_genes
 
 
-def imdb_regulon_venn_df(model, k):
+def imdb_regulon_venn_df(model, k, tf2genes=None):
     """
     Generates a dataframe for the regulon venn diagram of iModulon k. Returns
     None if there is no diagram to draw
@@ -1366,6 +1637,9 @@ def imdb_regulon_venn_df(model, k):
         IcaData object
     k : int or str
         iModulon name
+    tf2genes : dict, optional
+        Dictionary mapping each regulator in the TRN to its target genes. If
+        None, targets are looked up in model.trn (default = None)
 
     Returns
     -------
@@ -1382,10 +1656,11 @@ def imdb_regulon_venn_df(model, k):
         return None
 
     # Take care of and/or enrichments
-    reg_genes = _get_reg_genes(model, tf)
+    reg_genes = _get_reg_genes(model, tf, tf2genes)
 
-    # Get component genes
-    comp_genes = set(model.view_imodulon(k).index)
+    # Get component genes (only the locus tags are needed, not view_imodulon)
+    M_k = model.M[k]
+    comp_genes = set(M_k.index[M_k.abs() > model.thresholds[k]])
     both_genes = set(reg_genes & comp_genes)
 
     # Get gene and operon counts
@@ -1404,13 +1679,13 @@ def imdb_regulon_venn_df(model, k):
         reg_gene_count2 = 0
         comp_gene_count2 = 0
         both_gene_count2 = len(reg_genes)
-    elif all(item in comp_genes for item in reg_genes):
+    elif reg_genes <= comp_genes:
         reg_gene_count = 0
         both_gene_count = 0
         reg_gene_count2 = len(reg_genes)
         comp_gene_count2 = 0
         both_gene_count2 = 0
-    elif all(item in reg_genes for item in comp_genes):
+    elif comp_genes <= reg_genes:
         comp_gene_count = 0
         both_gene_count = 0
         reg_gene_count2 = 0
@@ -1445,9 +1720,11 @@ def imdb_regulon_venn_df(model, k):
     for i, l in zip(
         ["reg_genes", "comp_genes", "both_genes"], [just_reg, just_comp, both_genes]
     ):
-        gene_list = np.array([model.num2name(g) for g in l])
-        gene_list = np.array2string(gene_list, separator=" ")
-        res.loc[i, "list"] = gene_list
+        # skip the name lookup for empty lists (e.g. no regulated genes)
+        if l:
+            res.loc[i, "list"] = _gene_list_string(model.num2name(list(l)))
+        else:
+            res.loc[i, "list"] = "[]"
 
     return res
 
@@ -1477,24 +1754,9 @@ def get_tfs_to_scatter(model, tf_string, tfcomplex_to_genename=None, verbose=Fal
         List of gene loci
     """
 
-    # hard-coded TF names
-    # should just modify TRN/gene info so everything matches but ok
     if tfcomplex_to_genename is None:
         tfcomplex_to_genename = {}
-    rename_tfs = {
-        "csqR": "yihW",
-        "hprR": "yedW",
-        "thi-box": "Thi-box",
-        "FlhDC": "flhD",
-        "RcsAB": "rcsB",
-        "ntrC": "glnG",
-        "gutR": "srlR",
-        "IHF": "ihfB",
-        "H-NS": "hns",
-        "GadE-RcsB": "gadE",
-    }
-    for k, v in tfcomplex_to_genename.items():
-        rename_tfs[k] = v
+    rename_tfs = {**_RENAME_TFS, **tfcomplex_to_genename}
 
     res = []
     bad_res = []
@@ -1502,13 +1764,11 @@ def get_tfs_to_scatter(model, tf_string, tfcomplex_to_genename=None, verbose=Fal
 
         tf_string = tf_string.replace("[", "").replace("]", "")
 
-        tfs = re.split("[+/]", tf_string)
+        tfs = _TF_SPLIT.split(tf_string)
 
         for tf in tfs:
             tf = tf.strip()
-
-            if tf in rename_tfs.keys():
-                tf = rename_tfs[tf]
+            tf = rename_tfs.get(tf, tf)
 
             try:
                 b_num = model.name2num(tf)
@@ -1783,7 +2043,12 @@ def imdb_imodulon_basics_df(
 
 # Compute All iModulon Plots
 def make_im_directory(
-    model, k, path_prefix=".", gene_scatter_x="start", tfcomplex_to_genename=None
+    model,
+    k,
+    path_prefix=".",
+    gene_scatter_x="start",
+    tfcomplex_to_genename=None,
+    tf2genes=None,
 ):
     """
 
@@ -1803,6 +2068,9 @@ def make_im_directory(
         dictionary pointing complex TRN entries
         to matching gene names in the gene table
         ex: {"FlhDC":"flhD"}
+    tf2genes : dict, optional
+        Passed to imdb_gene_table_df() and imdb_regulon_venn_df() to look up
+        the target genes of each regulator (default = None)
 
     Returns
     -------
@@ -1813,36 +2081,37 @@ def make_im_directory(
     if tfcomplex_to_genename is None:
         tfcomplex_to_genename = {}
 
-    gene_table = imdb_gene_table_df(model, k)
+    gene_table = imdb_gene_table_df(model, k, tf2genes)
     gene_hist = imdb_gene_hist_df(model, k)
     gene_scatter = imdb_gene_scatter_df(model, k, gene_scatter_x)
     act_bar = imdb_activity_bar_df(model, k)
-    reg_venn = imdb_regulon_venn_df(model, k)
+    reg_venn = imdb_regulon_venn_df(model, k, tf2genes)
     reg_scatter = imdb_regulon_scatter_df(model, k, tfcomplex_to_genename)
 
     # generate a basic data df
     res = imdb_imodulon_basics_df(model, k, reg_venn, reg_scatter)
 
     # save output
-    folder = path_prefix + "/iModulon_files/" + str(k) + "/"
-    if not (os.path.isdir(path_prefix + "/iModulon_files")):
-        os.makedirs(path_prefix + "/iModulon_files")
-    if not (os.path.isdir(folder)):
-        os.makedirs(folder)
-    res.to_csv(folder + str(k) + "_meta.csv")
-    gene_table.to_csv(folder + str(k) + "_gene_table.csv")
-    gene_hist.to_csv(folder + str(k) + "_gene_hist.csv")
-    gene_scatter.to_csv(folder + str(k) + "_gene_scatter.csv")
-    act_bar.to_csv(folder + str(k) + "_activity_bar.csv")
-    if not (reg_venn is None):
-        reg_venn.to_csv(folder + str(k) + "_reg_venn.csv")
-    if not (reg_scatter is None):
-        reg_scatter.to_csv(folder + str(k) + "_reg_scatter.csv")
-    model.M[k].to_csv(folder + str(k) + "_gene_weights.csv")
+    folder = os.path.join(path_prefix, "iModulon_files", str(k))
+    os.makedirs(folder, exist_ok=True)
+    file_prefix = os.path.join(folder, str(k))
     a_k = model.A.loc[k]
     if "sample" in model.sample_table.columns:
         a_k.index = a_k.index.to_series().map(model.sample_table["sample"].to_dict())
-    a_k.to_csv(folder + str(k) + "_activity.csv")
+    out_files = {
+        "_meta.csv": res,
+        "_gene_table.csv": gene_table,
+        "_gene_hist.csv": gene_hist,
+        "_gene_scatter.csv": gene_scatter,
+        "_activity_bar.csv": act_bar,
+        "_reg_venn.csv": reg_venn,
+        "_reg_scatter.csv": reg_scatter,
+        "_gene_weights.csv": model.M[k],
+        "_activity.csv": a_k,
+    }
+    for suffix, table in out_files.items():
+        if table is not None:
+            table.to_csv(file_prefix + suffix)
 
 
 ###############################################
@@ -1852,7 +2121,7 @@ def make_im_directory(
 # Activity bar graph
 
 
-def imdb_gene_activity_bar_df(model, gene_id):
+def imdb_gene_activity_bar_df(model, gene_id, X_gene_id=None):
     """
 
 
@@ -1862,6 +2131,8 @@ def imdb_gene_activity_bar_df(model, gene_id):
         IcaData object
     gene_id : str
         Locus tag of gene
+    X_gene_id : ~pandas.Series, optional
+        Row of model.X for the gene, if already looked up (default: None)
 
     Returns
     -------
@@ -1869,45 +2140,13 @@ def imdb_gene_activity_bar_df(model, gene_id):
         A dataframe for the activity bar of gene in iModulonDB
     """
 
-    # get the row of A
-    X_gene_id = model.X.loc[gene_id]
+    # get the row of X
+    if X_gene_id is None:
+        X_gene_id = model.X.loc[gene_id]
 
-    # initialize the dataframe
     samp_table = model.sample_table.reset_index(drop=True)
-    X_gene_id = X_gene_id.rename(dict(zip(X_gene_id.index, samp_table.index)))
-    max_replicates = int(samp_table["n_replicates"].max())
-    columns = ["X_avg", "X_std", "n"] + list(
-        chain(
-            *[
-                ["rep{}_idx".format(i), "rep{}_X".format(i)]
-                for i in range(1, max_replicates + 1)
-            ]
-        )
-    )
-    res = pd.DataFrame(columns=columns)
-
-    # iterate through conditions and fill in rows
-    for cond, group in samp_table.groupby(["project", "condition"], sort=False):
-
-        # get condition name and X values
-        cond_name = cond[0] + "__" + cond[1]  # project__cond
-        vals = X_gene_id[group.index]
-
-        # compute statistics
-        new_row = [vals.mean(), vals.std(), len(vals)]
-
-        # fill in individual samples (indices and values)
-        for idx in group.index:
-            new_row += [idx, vals[idx]]
-        new_row += [np.nan] * ((max_replicates - len(vals)) * 2)
-
-        res.loc[cond_name] = new_row
-
-    # clean up
-    res.index.name = "condition"
-    res = res.reset_index()
-
-    return res
+    X_gene_id = X_gene_id.set_axis(samp_table.index)
+    return _activity_bar_df(X_gene_id, samp_table, "X")
 
 
 # iModulon Table
@@ -1965,42 +2204,93 @@ def imdb_gene_basics_df(model, g):
         A dataframe for the metadata of gene g in iModulonDB
     """
 
-    row = model.gene_table.loc[g]
-    res = pd.Series(
-        index=["gene_id", "name", "operon", "gene_product", "cog", "regulator", "link"],
-        dtype=float,
-    )
-    res.loc["gene_id"] = g
-    res.loc["name"] = row.gene_name
+    # plain dict lookups are cheaper than indexing the row Series per field
+    row = model.gene_table.loc[g].to_dict()
+    data = {"gene_id": g, "name": row["gene_name"]}
+    for elt in ["operon", "gene_product", "cog", "regulator"]:
+        data[elt] = row.get(elt, np.nan)
 
-    for elt in ["gene_product", "cog", "operon", "regulator"]:
-        try:
-            res.loc[elt] = row[elt]
-        except KeyError:
-            res.loc[elt] = np.nan
-
-    if type(model.gene_links[g]) == str:
-        res.loc["link"] = (
-            '<a href="'
-            + str(model.gene_links[g])
-            + '">'
-            + model.imodulondb_table["gene_link_db"]
-            + "</a>"
+    link = model.gene_links[g]
+    if isinstance(link, str):
+        data["link"] = (
+            '<a href="' + link + '">' + model.imodulondb_table["gene_link_db"] + "</a>"
         )
     else:
-        res.loc["link"] = np.nan
+        data["link"] = np.nan
 
     if model.imodulondb_table["organism_folder"] == "s_acidocaldarius":
-        res.loc["old_locus_tag"] = row.old_locus_tag
+        data["old_locus_tag"] = row["old_locus_tag"]
 
-    res.fillna(value="<i>Not Available</i>", inplace=True)
+    # fill in missing fields before building the series, rather than fillna
+    res = pd.Series(
+        {
+            key: "<i>Not Available</i>" if pd.isna(value) else value
+            for key, value in data.items()
+        }
+    )
     return res
 
 
 # Compute All Gene Data
 
 
-def make_gene_directory(model, g, path_prefix="."):
+def _write_series_csv(series, path):
+    """
+    Writes a small Series to a csv file, with the same output as
+    series.to_csv(path) but without the overhead of the pandas csv writer.
+    Helper function for make_gene_directory.
+
+    Parameters
+    ----------
+    series : ~pandas.Series
+        Series with a single-level index
+    path : str
+        Path of the csv file
+
+    Returns
+    -------
+    None
+    """
+
+    index_name = "" if series.index.name is None else series.index.name
+    name = 0 if series.name is None else series.name
+    if series.dtype.kind == "f":
+        # format all floats at once, as repr strings like pandas does
+        values = series.values.astype(str)
+        values[np.isnan(series.values)] = ""
+    else:
+        values = ["" if pd.isna(v) else v for v in series.values]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow([index_name, name])
+        writer.writerows(zip(series.index, values))
+
+
+def _gene_im_tables(model):
+    """
+    Creates the iModulon tables shared by all gene pages. Helper function for
+    make_gene_directory and imdb_generate_gene_files.
+
+    Parameters
+    ----------
+    model : :class:`~pymodulon.core.IcaData`
+        IcaData object
+
+    Returns
+    -------
+    im_table_short: ~pandas.DataFrame
+        Pre-cleaned version of model.imodulon_table
+    m_bin: ~pandas.DataFrame
+        Boolean transpose version of model.M_binarized
+    """
+
+    im_table_short = model.imodulon_table[["name", "regulator", "function", "category"]]
+    im_table_short.index.name = "k"
+    m_bin = model.M_binarized.astype(bool).T
+    return im_table_short, m_bin
+
+
+def make_gene_directory(model, g, path_prefix=".", im_table_short=None, m_bin=None):
     """
     Generates all data for gene g, stores it in a subfolder of path_prefix
 
@@ -2014,6 +2304,12 @@ def make_gene_directory(model, g, path_prefix="."):
         Path to the dataset folder. This function creates
         a 'gene_page_files/k/' subdirectory there to store everything.
         (default = ".")
+    im_table_short : ~pandas.DataFrame, optional
+        Pre-cleaned version of model.imodulon_table, as made by
+        _gene_im_tables(). Computed if None (default = None)
+    m_bin : ~pandas.DataFrame, optional
+        Boolean transpose version of model.M_binarized, as made by
+        _gene_im_tables(). Computed if None (default = None)
 
     Returns
     -------
@@ -2021,21 +2317,22 @@ def make_gene_directory(model, g, path_prefix="."):
         Table containing iModulon information for the gene
     """
 
-    im_table_short = model.imodulon_table[["name", "regulator", "function", "category"]]
-    im_table_short.index.name = "k"
-    m_bin = model.M_binarized.astype(bool).T
+    if im_table_short is None or m_bin is None:
+        im_table_short, m_bin = _gene_im_tables(model)
 
-    act_df = imdb_gene_activity_bar_df(model, g)
+    # look up the expression row once, for both the bar graph and the csv
+    X_g = model.X.loc[g]
+    act_df = imdb_gene_activity_bar_df(model, g, X_g)
     im_df = imdb_gene_im_table_df(model, g, im_table_short, m_bin)
     g_df = imdb_gene_basics_df(model, g)
 
-    folder = path_prefix + "/gene_page_files/" + str(g) + "/"
-    if not (os.path.isdir(folder)):
-        os.makedirs(folder)
+    folder = os.path.join(path_prefix, "gene_page_files", str(g))
+    os.makedirs(folder, exist_ok=True)
 
-    g_df.to_csv(folder + str(g) + "_meta.csv", header=True)
-    act_df.to_csv(folder + str(g) + "_activity_bar.csv")
-    model.X.loc[g].to_csv(folder + str(g) + "_expression.csv")
-    im_df.to_csv(folder + str(g) + "_perGene_table.csv")
+    file_prefix = os.path.join(folder, str(g))
+    _write_series_csv(g_df, file_prefix + "_meta.csv")
+    _write_series_csv(X_g, file_prefix + "_expression.csv")
+    act_df.to_csv(file_prefix + "_activity_bar.csv")
+    im_df.to_csv(file_prefix + "_perGene_table.csv")
 
     return im_df
@@ -3,18 +3,26 @@ General utility functions for the pymodulon package
 """
 import json
 import logging
+import os
 import re
+from functools import lru_cache
 from itertools import combinations
 
 import numpy as np
 import pandas as pd
 from scipy import stats
-from scipy.special import digamma
+from scipy.special import cbrt, digamma
 from sklearn.neighbors import BallTree, KDTree
 
 from pymodulon.enrichment import FDR
 
 
+try:
+    import numba
+except ImportError:  # numba is an optional dependency
+    numba = None
+
+
 ################
 # Type Aliases #
 ################
@@ -27,11 +35,15 @@ def _check_table(table, name, index=None, index_col=0):
 
     # Load table if necessary
     elif isinstance(table, str):
-        try:
-            table = pd.read_json(table)
-        except ValueError:
+        if table.endswith((".csv", ".tsv")) and os.path.isfile(table):
             sep = "\t" if table.endswith(".tsv") else ","
             table = pd.read_csv(table, index_col=index_col, sep=sep)
+        else:
+            try:
+                table = pd.read_json(table)
+            except ValueError:
+                sep = "\t" if table.endswith(".tsv") else ","
+                table = pd.read_csv(table, index_col=index_col, sep=sep)
 
     # Coerce indices and columns to ints if necessary
     newcols = []
@@ -68,7 +80,7 @@ def _check_table_helper(table, index, name):
         return pd.DataFrame(index=index)
 
     # Check if all indices are in table
-    missing_index = list(set(index) - set(table.index))
+    missing_index = pd.Index(index).difference(table.index, sort=False).tolist()
     if len(missing_index) > 0:
         logging.warning(
             "Some {} are missing from the {} table: {}".format(
@@ -77,7 +89,7 @@ def _check_table_helper(table, index, name):
         )
 
     # Remove extra indices from table
-    table = table.reindex(index)
+    table = table.reindex(index, copy=False)
     return table
 
 
@@ -91,6 +103,251 @@ def _check_dict(table, index_col=0):
     return table
 
 
+def _dagostino_k2(n, m2, m3, m4):
+    """
+    Computes the D'agostino K-squared statistic from sample moments. This
+    mirrors the skew and kurtosis tests in :func:`scipy.stats.normaltest`,
+    but operates directly on (arrays of) central moments and skips its input
+    validation. The log/sqrt and sign/power terms are replaced by the
+    equivalent arcsinh and cube root.
+
+    Parameters
+    ----------
+    n: int or ~numpy.ndarray
+        Number of samples (must be at least 8)
+    m2: float or ~numpy.ndarray
+        Second central moment
+    m3: float or ~numpy.ndarray
+        Third central moment
+    m4: float or ~numpy.ndarray
+        Fourth central moment
+
+    Returns
+    -------
+    k2: float or ~numpy.ndarray
+        D'agostino K-squared statistic
+    """
+
+    n = np.asarray(n, dtype=float)
+
+    # Skew test
+    y = m3 / m2**1.5 * np.sqrt(((n + 1) * (n + 3)) / (6.0 * (n - 2)))
+    beta2 = (
+        3.0
+        * (n**2 + 27 * n - 70)
+        * (n + 1)
+        * (n + 3)
+        / ((n - 2.0) * (n + 5) * (n + 7) * (n + 9))
+    )
+    w2 = -1 + np.sqrt(2 * (beta2 - 1))
+    delta = 1 / np.sqrt(0.5 * np.log(w2))
+    alpha = np.sqrt(2.0 / (w2 - 1))
+    y = np.where(y == 0, 1, y)
+    z_skew = delta * np.arcsinh(y / alpha)
+
+    # Kurtosis test
+    b2 = m4 / m2**2
+    mean_b2 = 3.0 * (n - 1) / (n + 1)
+    var_b2 = 24.0 * n * (n - 2) * (n - 3) / ((n + 1) * (n + 1.0) * (n + 3) * (n + 5))
+    x = (b2 - mean_b2) / np.sqrt(var_b2)
+    sqrt_beta1 = (
+        6.0
+        * (n * n - 5 * n + 2)
+        / ((n + 7) * (n + 9))
+        * np.sqrt((6.0 * (n + 3) * (n + 5)) / (n * (n - 2) * (n - 3)))
+    )
+    a = 6.0 + 8.0 / sqrt_beta1 * (
+        2.0 / sqrt_beta1 + np.sqrt(1 + 4.0 / (sqrt_beta1**2))
+    )
+    term1 = 1 - 2 / (9.0 * a)
+    denom = 1 + x * np.sqrt(2 / (a - 4.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        term2 = np.where(denom == 0.0, np.nan, cbrt((1 - 2.0 / a) / denom))
+    z_kurt = (term1 - term2) / np.sqrt(2 / (9.0 * a))
+
+    return z_skew**2 + z_kurt**2
+
+
+def _dagostino_curve(x):
+    """
+    Computes the D'agostino K-squared statistic for every prefix of an array,
+    using cumulative sums of powers rather than re-scanning each prefix
+
+    Parameters
+    ----------
+    x: ~numpy.ndarray
+        Gene weights, sorted by absolute value. If x is 2-D, each column is
+        treated as a separate component.
+
+    Returns
+    -------
+    k2: ~numpy.ndarray
+        Array with len(x) + 1 rows, where k2[n] is the K-squared statistic of
+        the first n values. Prefixes too small for the test (n < 8) are set to
+        infinity.
+    """
+
+    # Moments are shift-invariant, so center first to limit cancellation
+    x = np.asarray(x, dtype=float)
+    x = x - x.mean(axis=0)
+
+    n = np.arange(1, len(x) + 1, dtype=float).reshape((-1,) + (1,) * (x.ndim - 1))
+    mean = np.cumsum(x, axis=0) / n
+    s2 = np.cumsum(x**2, axis=0) / n
+    s3 = np.cumsum(x**3, axis=0) / n
+    s4 = np.cumsum(x**4, axis=0) / n
+
+    # Central moments from raw moments
+    m2 = s2 - mean**2
+    m3 = s3 - 3 * mean * s2 + 2 * mean**3
+    m4 = s4 - 4 * mean * s3 + 6 * mean**2 * s2 - 3 * mean**4
+
+    k2 = np.full((len(x) + 1,) + x.shape[1:], np.inf)
+    k2[8:] = _dagostino_k2(n[7:], m2[7:], m3[7:], m4[7:])
+    return k2
+
+
+def _k2_envelope(k_square):
+    """
+    Converts K-squared statistic curves (see _dagostino_curve) into
+    non-decreasing envelopes, where envelope[n] is the smallest K-squared
+    statistic of any set of at least n lowest-weighted genes. The number of
+    values below a cutoff is then the size of the largest such set.
+    """
+
+    # An undefined statistic ends the search regardless of the cutoff
+    k_square = np.where(np.isnan(k_square), -np.inf, k_square)
+    return np.minimum.accumulate(k_square[::-1], axis=0)[::-1]
+
+
+if numba is not None:
+
+    @numba.njit(cache=True)
+    def _dagostino_k2_scalar(n, m2, m3, m4):
+        """Scalar version of _dagostino_k2 for use in compiled loops"""
+
+        # Skew test
+        y = m3 / m2**1.5 * np.sqrt(((n + 1) * (n + 3)) / (6.0 * (n - 2)))
+        beta2 = (
+            3.0
+            * (n**2 + 27 * n - 70)
+            * (n + 1)
+            * (n + 3)
+            / ((n - 2.0) * (n + 5) * (n + 7) * (n + 9))
+        )
+        w2 = -1 + np.sqrt(2 * (beta2 - 1))
+        delta = 1 / np.sqrt(0.5 * np.log(w2))
+        alpha = np.sqrt(2.0 / (w2 - 1))
+        if y == 0:
+            y = 1.0
+        z_skew = delta * np.arcsinh(y / alpha)
+
+        # Kurtosis test
+        b2 = m4 / m2**2
+        mean_b2 = 3.0 * (n - 1) / (n + 1)
+        var_b2 = (
+            24.0 * n * (n - 2) * (n - 3) / ((n + 1) * (n + 1.0) * (n + 3) * (n + 5))
+        )
+        x = (b2 - mean_b2) / np.sqrt(var_b2)
+        sqrt_beta1 = (
+            6.0
+            * (n * n - 5 * n + 2)
+            / ((n + 7) * (n + 9))
+            * np.sqrt((6.0 * (n + 3) * (n + 5)) / (n * (n - 2) * (n - 3)))
+        )
+        a = 6.0 + 8.0 / sqrt_beta1 * (
+            2.0 / sqrt_beta1 + np.sqrt(1 + 4.0 / (sqrt_beta1**2))
+        )
+        term1 = 1 - 2 / (9.0 * a)
+        denom = 1 + x * np.sqrt(2 / (a - 4.0))
+        if denom == 0.0:
+            return np.nan
+        term2 = np.cbrt((1 - 2.0 / a) / denom)
+        z_kurt = (term1 - term2) / np.sqrt(2 / (9.0 * a))
+
+        return z_skew**2 + z_kurt**2
+
+    @numba.njit(cache=True)
+    def _dagostino_curve_numba(x):
+        """
+        Compiled version of _dagostino_curve, using single-pass (Welford-style)
+        updates of the central moments
+        """
+
+        k2 = np.full(len(x) + 1, np.inf)
+        mean = m2 = m3 = m4 = 0.0
+        for i in range(len(x)):
+            n = i + 1.0
+            delta = x[i] - mean
+            delta_n = delta / n
+            delta_n2 = delta_n * delta_n
+            term1 = delta * delta_n * (n - 1)
+            mean += delta_n
+            m4 += (
+                term1 * delta_n2 * (n * n - 3 * n + 3)
+                + 6 * delta_n2 * m2
+                - 4 * delta_n * m3
+            )
+            m3 += term1 * delta_n * (n - 2) - 3 * delta_n * m2
+            m2 += term1
+
+            if n >= 8:
+                k2[i + 1] = _dagostino_k2_scalar(n, m2 / n, m3 / n, m4 / n)
+        return k2
+
+    @numba.njit(parallel=True, cache=True)
+    def _dagostino_curves_numba(x):
+        """
+        Computes _dagostino_curve_numba for each column of x, in parallel.
+        Columns are read and written contiguously if x is Fortran-ordered.
+        """
+
+        k2 = np.empty((x.shape[1], x.shape[0] + 1))
+        for c in numba.prange(x.shape[1]):
+            k2[c] = _dagostino_curve_numba(x[:, c])
+        return k2.T
+
+
+@lru_cache(maxsize=512)
+def _dagostino_envelope(values):
+    """
+    Computes the sorted absolute gene weights and K-squared statistic curve
+    of a component. Results are cached, since the curve does not depend on the
+    D'agostino cutoff.
+
+    Parameters
+    ----------
+    values: bytes
+        Raw bytes of the float64 gene weights of a component
+
+    Returns
+    -------
+    ordered_genes: ~numpy.ndarray
+        Absolute gene weights in ascending order
+    envelope: ~numpy.ndarray
+        Non-decreasing array where envelope[n] is the smallest K-squared
+        statistic of any set of at least n lowest-weighted genes
+    """
+
+    x = np.frombuffer(values, dtype=np.float64)
+
+    # Sort genes based on absolute value
+    order = np.argsort(np.abs(x))
+    ordered_genes = np.abs(x)[order]
+
+    # Compute k2-statistic for all sets of the lowest-weighted genes
+    if numba is not None:
+        k_square = _dagostino_curve_numba(np.ascontiguousarray(x[order]))
+    else:
+        k_square = _dagostino_curve(x[order])
+
+    envelope = _k2_envelope(k_square)
+
+    ordered_genes.flags.writeable = False
+    envelope.flags.writeable = False
+    return ordered_genes, envelope
+
+
 def compute_threshold(ic, dagostino_cutoff):
     """
     Computes D'agostino-test-based threshold for a component of an M matrix
@@ -108,27 +365,98 @@ def compute_threshold(ic, dagostino_cutoff):
         List of thresholds for each iModulon
     """
 
-    i = 0
+    return _compute_threshold_sweep(ic, [dagostino_cutoff])[0]
 
-    # Sort genes based on absolute value
-    ordered_genes = abs(ic).sort_values()
 
-    # Compute k2-statistic
-    k_square, p = stats.normaltest(ic)
+def _compute_threshold_sweep(ic, dagostino_cutoffs):
+    """
+    Computes D'agostino-test-based thresholds for a component of an M matrix
+    at several cutoffs, with a single binary search of the k2-statistic
+    envelope
+
+    Parameters
+    ----------
+    ic: ~pandas.Series
+        Pandas Series containing an independent component
+    dagostino_cutoffs: list
+        D'agostino test statistic cutoffs to compute thresholds for
+
+    Returns
+    -------
+    thresholds: ~numpy.ndarray
+        Threshold for each cutoff
+    """
+
+    ordered_genes, envelope = _dagostino_envelope(
+        np.ascontiguousarray(ic.values, dtype=np.float64).tobytes()
+    )
+    dagostino_cutoffs = np.asarray(dagostino_cutoffs)
 
-    # Iteratively remove gene w/ largest weight until k2-statistic < cutoff
-    while k_square > dagostino_cutoff:
-        i -= 1
-        k_square, p = stats.normaltest(ic.loc[ordered_genes.index[:i]])
+    # Find the largest set of genes with a k2-statistic below each cutoff,
+    # equivalent to iteratively removing the gene w/ largest weight
+    idx = np.searchsorted(envelope, dagostino_cutoffs, side="right") - 1
 
-    # Select genes in iModulon
-    comp_genes = ordered_genes.iloc[i:]
+    if (idx < 0).any():
+        raise ValueError(
+            "D'agostino test statistic does not drop below {} for "
+            "component {}".format(dagostino_cutoffs[idx < 0].max(), ic.name)
+        )
 
     # Slightly modify threshold to improve plotting visibility
-    if len(comp_genes) == len(ic.index):
-        return max(comp_genes) + 0.05
+    n_genes = len(ordered_genes)
+    midpoints = 0.5 * (
+        ordered_genes[np.minimum(idx, n_genes - 1)] + ordered_genes[idx - 1]
+    )
+    return np.where(idx == n_genes, ordered_genes[-1] + 0.05, midpoints)
+
+
+def compute_all_thresholds(M, dagostino_cutoff):
+    """
+    Computes D'agostino-test-based thresholds for all components of an M
+    matrix at once
+
+    Parameters
+    ----------
+    M: ~pandas.DataFrame
+        M matrix from ICA
+    dagostino_cutoff: int
+        Minimum D'agostino test statistic value to determine threshold
+
+    Returns
+    -------
+    thresholds: dict
+        Dictionary mapping each iModulon to its threshold
+    """
+
+    # Sort genes in each component based on absolute value
+    x = M.values.astype(float)
+    x = np.take_along_axis(x, np.argsort(np.abs(x), axis=0), axis=0)
+    ordered_genes = np.abs(x)
+
+    # Compute k2-statistic curves, one component per thread if possible
+    if numba is not None:
+        k_square = _dagostino_curves_numba(np.asfortranarray(x))
     else:
-        return np.mean([ordered_genes.iloc[i], ordered_genes.iloc[i - 1]])
+        k_square = _dagostino_curve(x)
+
+    # Size of the largest set of genes with a k2-statistic below the cutoff
+    envelope = _k2_envelope(k_square)
+    idx = (envelope <= dagostino_cutoff).sum(axis=0) - 1
+
+    if (idx < 0).any():
+        raise ValueError(
+            "D'agostino test statistic does not drop below {} for "
+            "components {}".format(dagostino_cutoff, M.columns[idx < 0].tolist())
+        )
+
+    # Slightly modify threshold to improve plotting visibility
+    n_genes, cols = ordered_genes.shape[0], np.arange(ordered_genes.shape[1])
+    midpoints = 0.5 * (
+        ordered_genes[np.minimum(idx, n_genes - 1), cols] + ordered_genes[idx - 1, cols]
+    )
+    thresholds = np.where(idx == n_genes, ordered_genes[-1] + 0.05, midpoints)
+
+    return dict(zip(M.columns, thresholds))
 
 
 def dima(ica_data, sample1, sample2, threshold=5, fdr=0.1, alternate_A=None):
@@ -5,47 +5,60 @@ this function to work. """
 
 import pytest
 
-from pymodulon import example_data
 from pymodulon.core import IcaData
+from pymodulon.example_data import load_ecoli_data
 
 
-ecoli_data = example_data.load_ecoli_data()
+# Session-scoped objects are loaded once, on first use. Tests should use the
+# function-scoped copies below, so that they are free to modify them.
 
-# Add an iModulon with a number as its name
-ecoli_data.rename_imodulons({"CdaR": 2})
 
-# Smaller version of Ecoli data with 10 iModulons
-mini_data = IcaData(
-    ecoli_data.M.iloc[:, :10],
-    ecoli_data.A.iloc[:10, :],
-    gene_table=ecoli_data.gene_table,
-    imodulon_table=ecoli_data.imodulon_table[:10],
-    trn=ecoli_data.trn,
-    optimize_cutoff=False,
-    dagostino_cutoff=2000,
-)
+@pytest.fixture(scope="session")
+def ecoli_data():
+    ecoli_data = load_ecoli_data()
 
-# Capture expected UserWarning here
-mini_data_opt = IcaData(
-    ecoli_data.M.iloc[:, :10],
-    ecoli_data.A.iloc[:10, :],
-    gene_table=ecoli_data.gene_table,
-    imodulon_table=ecoli_data.imodulon_table[:10],
-    trn=ecoli_data.trn,
-    optimize_cutoff=True,
-)
+    # Add an iModulon with a number as its name
+    ecoli_data.rename_imodulons({"CdaR": 2})
+    return ecoli_data
+
+
+@pytest.fixture(scope="session")
+def mini_data(ecoli_data):
+    # Smaller version of Ecoli data with 10 iModulons
+    return IcaData(
+        ecoli_data.M.iloc[:, :10],
+        ecoli_data.A.iloc[:10, :],
+        gene_table=ecoli_data.gene_table,
+        imodulon_table=ecoli_data.imodulon_table[:10],
+        trn=ecoli_data.trn,
+        optimize_cutoff=False,
+        dagostino_cutoff=2000,
+    )
+
+
+@pytest.fixture(scope="session")
+def mini_data_opt(ecoli_data):
+    # Capture expected UserWarning here
+    return IcaData(
+        ecoli_data.M.iloc[:, :10],
+        ecoli_data.A.iloc[:10, :],
+        gene_table=ecoli_data.gene_table,
+        imodulon_table=ecoli_data.imodulon_table[:10],
+        trn=ecoli_data.trn,
+        optimize_cutoff=True,
+    )
 
 
 @pytest.fixture()
-def ecoli_obj():
+def ecoli_obj(ecoli_data):
     return ecoli_data.copy()
 
 
 @pytest.fixture()
-def mini_obj():
+def mini_obj(mini_data):
     return mini_data.copy()
 
 
 @pytest.fixture()
-def mini_obj_opt():
+def mini_obj_opt(mini_data_opt):
     return mini_data_opt.copy()
@@ -8,12 +8,18 @@ from pymodulon.core import IcaData
 from pymodulon.example_data import load_example_bbh, load_staph_data
 
 
-@pytest.fixture
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+# These are only read by the tests, so they are loaded once per module
+
+
+@pytest.fixture(scope="module")
 def staph_obj():
     return load_staph_data()
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def example_bbh():
     return load_example_bbh()
 
@@ -52,7 +58,7 @@ def test_convert_gene_index(staph_obj, example_bbh, ecoli_obj):
 
 @pytest.mark.filterwarnings("ignore:BiopythonWarning")
 def test_make_prots_faout(tmp_path):
-    gbk = os.path.join("tests", "data", "genome.gb")
+    gbk = os.path.join(DATA_DIR, "genome.gb")
     fa_out = tmp_path / "test.fa"
     fa_out.touch()
     cmp.make_prots(gbk, fa_out)
@@ -70,13 +76,13 @@ def test_make_prots_faout(tmp_path):
 # create single and multi-file params for test_make_prots_db
 
 single_file = {
-    "fasta_file": os.path.join("tests", "data", "proteins.faa"),
+    "fasta_file": os.path.join(DATA_DIR, "proteins.faa"),
     "outname": "test_db.fa",
 }
 multi_file = {
     "fasta_file": [
-        os.path.join("tests", "data", "proteins.faa"),
-        os.path.join("tests", "data", "truncated_proteins.faa"),
+        os.path.join(DATA_DIR, "proteins.faa"),
+        os.path.join(DATA_DIR, "truncated_proteins.faa"),
     ],
     "outname": "test_db.fa",
     "combined": "combined.fa",
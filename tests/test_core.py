@@ -1,8 +1,9 @@
 import logging
 
 import numpy as np
+import pandas as pd
 
-from pymodulon.core import IcaData
+from pymodulon.core import IcaData, _cutoff_f1_scores
 from pymodulon.io import load_json_model, save_to_json
 
 
@@ -107,15 +108,28 @@ def test_init_thresholds(ecoli_obj, mini_obj_opt, caplog, tmp_path):
 def test_m_binarized(ecoli_obj):
     binary_m = ecoli_obj.M_binarized
     assert binary_m["GlpR"].sum() == 9
+    assert (binary_m.dtypes == np.float64).all()
+    assert binary_m.index.equals(ecoli_obj.M.index)
+    assert binary_m.columns.equals(ecoli_obj.M.columns)
+
+    # Sums and products over large iModulons must not overflow
+    ecoli_obj.change_threshold("GlpR", 0.01)
+    binary_m = ecoli_obj.M_binarized
+    n_genes = (ecoli_obj.M["GlpR"].abs() > 0.01).sum()
+    assert n_genes > 127
+    assert binary_m["GlpR"].sum() == n_genes
+    assert binary_m.T.dot(binary_m).loc["GlpR", "GlpR"] == n_genes
+    i = binary_m.columns.get_loc("GlpR")
+    assert (binary_m.values.T @ binary_m.values)[i, i] == n_genes
 
 
 def test_imodulon_names(ecoli_obj, caplog):
     # Ensure that iModulon names are consistent
-    imodulon_list = ecoli_obj.imodulon_names
+    imodulon_list = pd.Index(ecoli_obj.imodulon_names)
     assert (
-        imodulon_list == ecoli_obj.M.columns.tolist()
-        and imodulon_list == ecoli_obj.A.index.tolist()
-        and imodulon_list == ecoli_obj.imodulon_table.index.tolist()
+        imodulon_list.equals(ecoli_obj.M.columns)
+        and imodulon_list.equals(ecoli_obj.A.index)
+        and imodulon_list.equals(ecoli_obj.imodulon_table.index)
     )
 
     # Test imodulon_names setter
@@ -129,21 +143,21 @@ def test_imodulon_names(ecoli_obj, caplog):
 
 def test_sample_names(ecoli_obj):
     # Ensure that sample names are consistent
-    sample_list = ecoli_obj.sample_names
+    sample_list = pd.Index(ecoli_obj.sample_names)
     assert (
-        sample_list == ecoli_obj.X.columns.tolist()
-        and sample_list == ecoli_obj.A.columns.tolist()
-        and sample_list == ecoli_obj.sample_table.index.tolist()
+        sample_list.equals(ecoli_obj.X.columns)
+        and sample_list.equals(ecoli_obj.A.columns)
+        and sample_list.equals(ecoli_obj.sample_table.index)
     )
 
 
 def test_gene_names(ecoli_obj):
     # Ensure that gene names are consistent
-    gene_list = ecoli_obj.gene_names
+    gene_list = pd.Index(ecoli_obj.gene_names)
     assert (
-        gene_list == ecoli_obj.X.index.tolist()
-        and gene_list == ecoli_obj.M.index.tolist()
-        and gene_list == ecoli_obj.gene_table.index.tolist()
+        gene_list.equals(ecoli_obj.X.index)
+        and gene_list.equals(ecoli_obj.M.index)
+        and gene_list.equals(ecoli_obj.gene_table.index)
     )
 
     # Check if gene names are used
@@ -213,6 +227,7 @@ def test_recompute_thresholds(mini_obj_opt):
 
 def test_compute_kmeans_thresholds(mini_obj):
     # Make sure thresholds are different when two threshold methods are used
+    # (mini_obj already uses D'agostino thresholds)
     ica_data1 = IcaData(
         mini_obj.M,
         mini_obj.A,
@@ -221,14 +236,6 @@ def test_compute_kmeans_thresholds(mini_obj):
         trn=mini_obj.trn,
         threshold_method="kmeans",
     )
-    ica_data2 = IcaData(
-        mini_obj.M,
-        mini_obj.A,
-        gene_table=mini_obj.gene_table,
-        imodulon_table=mini_obj.imodulon_table,
-        trn=mini_obj.trn,
-        threshold_method="dagostino",
-    )
     # Check that kmeans is used when no TRN is given
     ica_no_trn = IcaData(
         mini_obj.M,
@@ -238,7 +245,7 @@ def test_compute_kmeans_thresholds(mini_obj):
     )
 
     assert not np.allclose(
-        list(ica_data1.thresholds.values()), list(ica_data2.thresholds.values())
+        list(ica_data1.thresholds.values()), list(mini_obj.thresholds.values())
     )
     assert np.allclose(
         list(ica_no_trn.thresholds.values()), list(ica_data1.thresholds.values())
@@ -258,6 +265,29 @@ def test_reoptimize_thresholds(mini_obj, capsys):
     assert "Cutoff already optimized" in captured.out
 
 
+def test_reoptimize_thresholds_cache(mini_data, monkeypatch, tmp_path):
+    monkeypatch.setenv("PYMODULON_CACHE", str(tmp_path))
+
+    # Count how often the F1 scores are actually computed
+    n_calls = []
+
+    def counted_f1_scores(M, trn, cutoffs_to_try, progress):
+        n_calls.append(1)
+        return _cutoff_f1_scores(M, trn, cutoffs_to_try, progress)
+
+    monkeypatch.setattr("pymodulon.core._cutoff_f1_scores", counted_f1_scores)
+
+    # The second optimization should be loaded from the on-disk cache
+    thresholds = []
+    for _ in range(2):
+        obj = mini_data.copy()
+        obj.reoptimize_thresholds(progress=False, plot=False)
+        assert obj.dagostino_cutoff == 800
+        thresholds.append(obj.thresholds)
+    assert len(n_calls) == 1
+    assert thresholds[0] == thresholds[1]
+
+
 def test_compute_regulon_enrichment(ecoli_obj):
     # Single enrichment
     enrich = ecoli_obj.compute_regulon_enrichment("GlpR", "glpR")
@@ -0,0 +1,124 @@
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pymodulon.imodulondb import (
+    _gene_list_string,
+    _write_series_csv,
+    generate_n_replicates_column,
+    imdb_activity_bar_df,
+    imdb_gene_activity_bar_df,
+    imdb_gene_scatter_df,
+)
+
+
+@pytest.mark.parametrize(
+    "genes",
+    [
+        [],
+        ["thrA"],
+        ["thrA", "thrB", "thrC"],
+        ["b{:04d}".format(i) for i in range(60)],
+        ["yjjZ", "a" * 80, "hisG", "isn't"],
+        ["g{}".format(i) for i in range(1500)],
+    ],
+)
+def test_gene_list_string(genes):
+    assert _gene_list_string(genes) == np.array2string(np.array(genes), separator=" ")
+
+
+@pytest.mark.parametrize(
+    "series",
+    [
+        pd.Series({"gene_id": "b0002", "name": "thrA", "cog": np.nan}),
+        pd.Series(
+            {"regulator": "ArcA,Fnr", "link": '<a href="x">EcoCyc</a>'}, name="b0003"
+        ),
+        pd.Series([0.5, np.nan, -1.25e-05], index=["s1", "s2", "s3"], name="b0004"),
+    ],
+)
+def test_write_series_csv(series, tmp_path):
+    series.to_csv(tmp_path / "pandas.csv")
+    _write_series_csv(series, tmp_path / "imdb.csv")
+    assert (tmp_path / "imdb.csv").read_text() == (tmp_path / "pandas.csv").read_text()
+
+
+def _loop_activity_bar_df(values, samp_table, name):
+    # Reference implementation: one row per condition, as originally written
+    max_replicates = int(samp_table["n_replicates"].max())
+    columns = [name + "_avg", name + "_std", "n"] + list(
+        chain(
+            *[
+                ["rep{}_idx".format(i), "rep{}_{}".format(i, name)]
+                for i in range(1, max_replicates + 1)
+            ]
+        )
+    )
+    res = pd.DataFrame(columns=columns)
+    for cond, group in samp_table.groupby(["project", "condition"], sort=False):
+        vals = values[group.index]
+        new_row = [vals.mean(), vals.std(), len(vals)]
+        for idx in group.index:
+            new_row += [idx, vals[idx]]
+        new_row += [np.nan] * ((max_replicates - len(vals)) * 2)
+        res.loc[cond[0] + "__" + cond[1]] = new_row
+    res.index.name = "condition"
+    return res.reset_index().astype(dict.fromkeys(columns, float))
+
+
+def test_activity_bar_df_missing_condition(ecoli_obj):
+    # Samples without a condition are left out of the bar graphs
+    ecoli_obj.sample_table.loc[ecoli_obj.sample_table.index[1], "condition"] = np.nan
+    generate_n_replicates_column(ecoli_obj)
+    samp_table = ecoli_obj.sample_table.reset_index(drop=True)
+
+    k = ecoli_obj.imodulon_table.index[0]
+    A_k = ecoli_obj.A.loc[k].set_axis(samp_table.index)
+    pd.testing.assert_frame_equal(
+        imdb_activity_bar_df(ecoli_obj, k),
+        _loop_activity_bar_df(A_k, samp_table, "A"),
+    )
+
+    g = ecoli_obj.X.index[0]
+    X_g = ecoli_obj.X.loc[g].set_axis(samp_table.index)
+    pd.testing.assert_frame_equal(
+        imdb_gene_activity_bar_df(ecoli_obj, g),
+        _loop_activity_bar_df(X_g, samp_table, "X"),
+    )
+
+
+def test_gene_scatter_rgb_cog_colors(mini_obj):
+    # COG colors may be set to unhashable RGB lists or arrays
+    mini_obj.gene_table = mini_obj.gene_table.rename(columns={"COG": "cog"})
+    cogs = mini_obj.gene_table.cog.unique()
+    mini_obj.cog_colors = {
+        cog: [1.0, 0.0, 0.0] if i % 2 else np.array([0.0, 0.0, 1.0])
+        for i, cog in enumerate(cogs)
+    }
+    res = imdb_gene_scatter_df(mini_obj, mini_obj.imodulon_names[0])
+    res = res.drop("meta")
+    expected = [
+        "#ff0000" if list(cogs).index(cog) % 2 else "#0000ff"
+        for cog in mini_obj.gene_table.cog[res.index]
+    ]
+    assert res.color.tolist() == expected
+
+
+@pytest.mark.parametrize("n_replicates", [None, 5, 5.0])
+def test_generate_n_replicates_column(ecoli_obj, n_replicates):
+    # Compare with the original loop over conditions, including a sample
+    # without a condition and an existing n_replicates column
+    sample_table = ecoli_obj.sample_table.copy()
+    sample_table.loc[sample_table.index[1], "condition"] = np.nan
+    if n_replicates is not None:
+        sample_table["n_replicates"] = n_replicates
+    ecoli_obj.sample_table = sample_table
+
+    expected = ecoli_obj.sample_table.copy()
+    for _, group in expected.groupby(["project", "condition"]):
+        expected.loc[group.index, "n_replicates"] = group.shape[0]
+
+    generate_n_replicates_column(ecoli_obj)
+    pd.testing.assert_frame_equal(ecoli_obj.sample_table, expected)
@@ -83,8 +83,8 @@ def test_plot_regulon_histogram(ecoli_obj, tmp_path):
 
     copy_obj = ecoli_obj.copy()
     copy_obj.imodulon_table = None
+    assert copy_obj.imodulon_table.shape == (len(copy_obj.imodulon_names), 0)
     plot_regulon_histogram(copy_obj, "GlpR")
-    print(copy_obj.imodulon_names)
     plot_regulon_histogram(copy_obj, "proVWX")
     copy_obj.trn = None
     plot_regulon_histogram(copy_obj, "GlpR")
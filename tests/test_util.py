@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+import pymodulon.util
+from pymodulon.util import (
+    _check_table,
+    _compute_threshold_sweep,
+    _dagostino_curve,
+    _dagostino_envelope,
+    compute_all_thresholds,
+    compute_threshold,
+)
+
+
+def _compute_threshold_loop(ic, dagostino_cutoff):
+    # Reference implementation that iteratively removes the largest gene
+    i = 0
+    ordered_genes = abs(ic).sort_values()
+    k_square, p = stats.normaltest(ic)
+    while k_square > dagostino_cutoff:
+        i -= 1
+        k_square, p = stats.normaltest(ic.loc[ordered_genes.index[:i]])
+    if i == 0:
+        return max(ordered_genes) + 0.05
+    else:
+        return np.mean([ordered_genes.iloc[i], ordered_genes.iloc[i - 1]])
+
+
+def test_dagostino_curve(mini_obj):
+    ic = mini_obj.M.iloc[:, 0]
+    x = ic.values[np.argsort(np.abs(ic.values))]
+    k2 = _dagostino_curve(x)
+
+    assert len(k2) == len(x) + 1
+    assert np.isinf(k2[:8]).all()
+    for n in [8, 20, 100, len(x)]:
+        assert np.isclose(k2[n], stats.normaltest(x[:n])[0])
+
+
+@pytest.mark.parametrize("dagostino_cutoff", [50, 550, 2000])
+def test_compute_threshold(mini_obj, dagostino_cutoff):
+    for k in mini_obj.imodulon_names:
+        ic = mini_obj.M[k]
+        assert np.isclose(
+            compute_threshold(ic, dagostino_cutoff),
+            _compute_threshold_loop(ic, dagostino_cutoff),
+        )
+
+
+@pytest.mark.parametrize("dagostino_cutoff", [50, 550, 2000])
+def test_compute_all_thresholds(mini_obj, dagostino_cutoff):
+    thresholds = compute_all_thresholds(mini_obj.M, dagostino_cutoff)
+    assert list(thresholds.keys()) == mini_obj.imodulon_names
+    for k in mini_obj.imodulon_names:
+        assert np.isclose(
+            thresholds[k], compute_threshold(mini_obj.M[k], dagostino_cutoff)
+        )
+
+
+def test_dagostino_curve_numba(mini_obj):
+    pytest.importorskip("numba")
+    ic = mini_obj.M.iloc[:, 0]
+    x = ic.values[np.argsort(np.abs(ic.values))]
+    assert np.allclose(
+        pymodulon.util._dagostino_curve_numba(x), _dagostino_curve(x), rtol=1e-8
+    )
+
+
+def test_compute_threshold_cache(mini_obj):
+    ic = mini_obj.M.iloc[:, 0]
+    compute_threshold(ic, 550)
+    hits = _dagostino_envelope.cache_info().hits
+    compute_threshold(ic, 1000)
+    assert _dagostino_envelope.cache_info().hits == hits + 1
+
+
+def test_compute_all_thresholds_without_numba(mini_obj, monkeypatch):
+    pytest.importorskip("numba")
+    thresholds = compute_all_thresholds(mini_obj.M, 550)
+    monkeypatch.setattr(pymodulon.util, "numba", None)
+    assert np.allclose(
+        list(compute_all_thresholds(mini_obj.M, 550).values()),
+        list(thresholds.values()),
+    )
+
+
+def test_check_table_csv_path(tmp_path):
+    table = pd.DataFrame({"a": [1.0, 2.0]}, index=["g1", "g2"])
+    csv_file = str(tmp_path / "table.csv")
+    tsv_file = str(tmp_path / "table.tsv")
+    table.to_csv(csv_file)
+    table.to_csv(tsv_file, sep="\t")
+
+    pd.testing.assert_frame_equal(_check_table(csv_file, "gene"), table)
+    pd.testing.assert_frame_equal(_check_table(tsv_file, "gene"), table)
+    reindexed = _check_table(csv_file, "gene", index=["g2", "g3"])
+    assert reindexed.index.tolist() == ["g2", "g3"]
+
+
+def test_compute_threshold_sweep(mini_obj):
+    cutoffs = np.arange(50, 2000, 50)
+    for imod in mini_obj.M.columns[:3]:
+        ic = mini_obj.M[imod]
+        expected = [_compute_threshold_loop(ic, cutoff) for cutoff in cutoffs]
+        assert np.array_equal(_compute_threshold_sweep(ic, cutoffs), expected)
+
+    with pytest.raises(ValueError):
+        _compute_threshold_sweep(mini_obj.M.iloc[:, 0], [-1, 50])